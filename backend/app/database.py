@@ -3,41 +3,193 @@ SQLite database setup and operations for conversation storage
 """
 import sqlite3
 import os
-from typing import List, Dict, Optional
+import threading
+from typing import Iterator, List, Dict, Optional, Sequence, Tuple
 from datetime import datetime
 
+# Largest SQLite rowid (upper bound for keyset cursors)
+_MAX_ROWID = 2 ** 63 - 1
+
+# Insert or update the summary of the session of one message (by message id)
+_UPSERT_SESSION_SQL = '''
+    INSERT INTO sessions (id, created_at, last_message_at, last_message_id, message_count, last_role)
+    SELECT session_id, created_at, created_at, id, 1, role
+    FROM conversations
+    WHERE id = ?
+    ON CONFLICT(id) DO UPDATE SET
+        last_message_at = excluded.last_message_at,
+        last_message_id = excluded.last_message_id,
+        message_count = message_count + 1,
+        last_role = excluded.last_role
+'''
+
+_SESSION_COLUMNS = "id, created_at, last_message_at, last_message_id, message_count, last_role"
+
+
+def _session_row(row) -> Dict:
+    """Map a sessions row (selected with _SESSION_COLUMNS) to a dictionary"""
+    return {
+        'session_id': row[0],
+        'created_at': row[1],
+        'last_message_at': row[2],
+        'last_message_id': row[3],
+        'message_count': row[4],
+        'last_role': row[5]
+    }
+
+
+# Backfill summaries for conversations written before the sessions table existed
+_BACKFILL_SESSIONS_SQL = '''
+    INSERT INTO sessions (id, created_at, last_message_at, last_message_id, message_count, last_role)
+    SELECT s.session_id, f.created_at, l.created_at, s.last_id, s.message_count, l.role
+    FROM (
+        SELECT session_id, MIN(id) AS first_id, MAX(id) AS last_id, COUNT(*) AS message_count
+        FROM conversations
+        GROUP BY session_id
+    ) AS s
+    JOIN conversations AS f ON f.id = s.first_id
+    JOIN conversations AS l ON l.id = s.last_id
+'''
+
+# Schema migrations: (version, name, statements), applied in order, each in its own
+# transaction. Statements are idempotent so databases created before versioning
+# (tables present, no schema_migrations rows) migrate cleanly. Append only.
+_MIGRATIONS: List[Tuple[int, str, Tuple[str, ...]]] = [
+    (1, "create_conversations", (
+        '''
+        CREATE TABLE IF NOT EXISTS conversations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL CHECK (role IN ('user', 'assistant')),
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    )),
+    # Index on (session_id, id): session lookups, keyset pagination and
+    # per-session aggregates are answered from the index alone
+    (2, "index_conversations_session_id_id", (
+        'CREATE INDEX IF NOT EXISTS idx_conversations_session_id_id ON conversations(session_id, id)',
+        'DROP INDEX IF EXISTS idx_session_id',
+    )),
+    # Per-session summary, maintained by save_message/delete_conversation
+    (3, "create_sessions", (
+        '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            created_at TIMESTAMP NOT NULL,
+            last_message_at TIMESTAMP NOT NULL,
+            last_message_id INTEGER NOT NULL,
+            message_count INTEGER NOT NULL,
+            last_role TEXT NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_last_message_id ON sessions(last_message_id)',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_last_message_at ON sessions(last_message_at)',
+        # No-op when summaries already exist
+        _BACKFILL_SESSIONS_SQL + ' WHERE NOT EXISTS (SELECT 1 FROM sessions)',
+    )),
+]
+
+SCHEMA_VERSION = _MIGRATIONS[-1][0]
+
 
 class Database:
     """Simple SQLite database for storing conversations"""
     
     def __init__(self, db_path: str = "chatbot.db"):
+        # No I/O here: the schema is created/migrated on first use (or by init_database)
         self.db_path = db_path
-        self.init_database()
+        self._initialized = False
+        self._init_lock = threading.Lock()
     
-    def init_database(self):
-        """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _connect(self, timeout: float = 5.0) -> sqlite3.Connection:
+        """Open a connection, migrating the schema on first use"""
+        if not self._initialized:
+            self.init_database()
+        return sqlite3.connect(self.db_path, timeout=timeout)
+    
+    def init_database(self) -> int:
+        """
+        Create the database and apply pending schema migrations
         
-        # Create conversations table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS conversations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT NOT NULL,
-                role TEXT NOT NULL CHECK (role IN ('user', 'assistant')),
-                content TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        Safe to call repeatedly and from several processes (migrations run under
+        a write lock and are recorded in schema_migrations).
         
-        # Create index for faster session_id queries
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_session_id ON conversations(session_id)
-        ''')
+        Returns:
+            Number of migrations applied
+        """
+        with self._init_lock:
+            if self._initialized:
+                return 0
+            
+            # Autocommit mode: transactions below are explicit
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            try:
+                # Let retention reclaim space page by page (only takes effect on a new, empty file)
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        version INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                applied = 0
+                for version, name, statements in _MIGRATIONS:
+                    # Cheap check first so an up-to-date database never takes the write lock
+                    if conn.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (version,)).fetchone():
+                        continue
+                    conn.execute('BEGIN IMMEDIATE')
+                    try:
+                        # Another process may have applied it while we waited for the lock
+                        if conn.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (version,)).fetchone():
+                            conn.execute('COMMIT')
+                            continue
+                        for statement in statements:
+                            conn.execute(statement)
+                        conn.execute('INSERT INTO schema_migrations (version, name) VALUES (?, ?)', (version, name))
+                        conn.execute('COMMIT')
+                    except Exception:
+                        conn.execute('ROLLBACK')
+                        raise
+                    applied += 1
+                    print(f"🗄️  Migration {version} ({name}) applied: {self.db_path}")
+            finally:
+                conn.close()
+            
+            self._initialized = True
+            print(f"Database initialized: {self.db_path} (schema v{SCHEMA_VERSION})")
+            return applied
+    
+    def schema_version(self) -> int:
+        """Highest applied migration version (0 for a new or unversioned file; no migration is run)"""
+        if not os.path.exists(self.db_path):
+            return 0
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute('SELECT MAX(version) FROM schema_migrations').fetchone()
+        except sqlite3.OperationalError:
+            row = None
+        finally:
+            conn.close()
+        return (row[0] or 0) if row else 0
+    
+    def backfill_sessions(self) -> int:
+        """
+        Rebuild missing session summaries (when the sessions table is empty)
         
+        Returns:
+            Number of summaries inserted
+        """
+        conn = self._connect(timeout=30)
+        cursor = conn.cursor()
+        cursor.execute(_BACKFILL_SESSIONS_SQL + ' WHERE NOT EXISTS (SELECT 1 FROM sessions)')
+        inserted = cursor.rowcount
         conn.commit()
         conn.close()
-        print(f"Database initialized: {self.db_path}")
+        return inserted
     
     def save_message(self, session_id: str, role: str, content: str) -> int:
         """
@@ -51,7 +203,7 @@ class Database:
         Returns:
             Message ID
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -60,11 +212,46 @@ class Database:
         ''', (session_id, role, content))
         
         message_id = cursor.lastrowid
+        
+        # Update the session summary in the same transaction
+        cursor.execute(_UPSERT_SESSION_SQL, (message_id,))
+        
         conn.commit()
         conn.close()
         
         return message_id
     
+    def save_messages(self, messages: Sequence[Tuple[str, str, str]]) -> List[int]:
+        """
+        Save several messages in one transaction
+        
+        Args:
+            messages: (session_id, role, content) tuples, in order
+            
+        Returns:
+            Message IDs, in input order
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        message_ids = []
+        try:
+            for session_id, role, content in messages:
+                cursor.execute('''
+                    INSERT INTO conversations (session_id, role, content)
+                    VALUES (?, ?, ?)
+                ''', (session_id, role, content))
+                message_ids.append(cursor.lastrowid)
+                cursor.execute(_UPSERT_SESSION_SQL, (cursor.lastrowid,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return message_ids
+    
     def get_conversation(self, session_id: str) -> List[Dict]:
         """
         Get all messages for a session
@@ -75,14 +262,14 @@ class Database:
         Returns:
             List of message dictionaries
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
             SELECT id, role, content, created_at
             FROM conversations
             WHERE session_id = ?
-            ORDER BY created_at ASC
+            ORDER BY id ASC
         ''', (session_id,))
         
         rows = cursor.fetchall()
@@ -99,15 +286,91 @@ class Database:
         
         return messages
     
-    def get_all_sessions(self) -> List[str]:
-        """Get all unique session IDs"""
-        conn = sqlite3.connect(self.db_path)
+    def iter_conversation(self, session_id: str, batch_size: int = 200) -> Iterator[Dict]:
+        """
+        Iterate over a session's messages in id order, reading batch_size rows at a time
+        
+        Args:
+            session_id: Session identifier
+            batch_size: Rows fetched per query
+            
+        Yields:
+            Message dictionaries
+        """
+        last_id = 0
+        while True:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, role, content, created_at
+                FROM conversations
+                WHERE session_id = ? AND id > ?
+                ORDER BY id ASC
+                LIMIT ?
+            ''', (session_id, last_id, batch_size))
+            rows = cursor.fetchall()
+            conn.close()
+            
+            for row in rows:
+                yield {
+                    'id': row[0],
+                    'role': row[1],
+                    'content': row[2],
+                    'created_at': row[3]
+                }
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+    
+    def get_history(self, session_id: str, after_id: Optional[int] = None, limit: int = 50) -> Dict:
+        """
+        Get one page of a session's messages (keyset pagination on id)
+        
+        Args:
+            session_id: Session identifier
+            after_id: Return messages with id greater than this (None = from the start)
+            limit: Maximum number of messages
+            
+        Returns:
+            Dict with messages, next_after_id (cursor for the next page) and has_more
+        """
+        conn = self._connect()
         cursor = conn.cursor()
         
+        # Fetch one extra row to know whether another page exists
         cursor.execute('''
-            SELECT DISTINCT session_id
+            SELECT id, role, content, created_at
             FROM conversations
-            ORDER BY MAX(created_at) DESC
+            WHERE session_id = ? AND id > ?
+            ORDER BY id ASC
+            LIMIT ?
+        ''', (session_id, after_id or 0, limit + 1))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        messages = [
+            {'id': row[0], 'role': row[1], 'content': row[2], 'created_at': row[3]}
+            for row in rows
+        ]
+        
+        return {
+            'messages': messages,
+            'next_after_id': rows[-1][0] if has_more else None,
+            'has_more': has_more
+        }
+    
+    def get_all_sessions(self) -> List[str]:
+        """Get all unique session IDs (most recently active first)"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id
+            FROM sessions
+            ORDER BY last_message_id DESC
         ''')
         
         rows = cursor.fetchall()
@@ -115,6 +378,123 @@ class Database:
         
         return [row[0] for row in rows]
     
+    def get_session(self, session_id: str) -> Optional[Dict]:
+        """
+        Get a session summary
+        
+        Args:
+            session_id: Session identifier
+            
+        Returns:
+            Session dictionary, or None if the session has no messages
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            SELECT {_SESSION_COLUMNS}
+            FROM sessions
+            WHERE id = ?
+        ''', (session_id,))
+        
+        row = cursor.fetchone()
+        conn.close()
+        
+        return _session_row(row) if row else None
+    
+    def count_sessions(self) -> int:
+        """Number of sessions with at least one message"""
+        conn = self._connect()
+        count = conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+        conn.close()
+        return count
+    
+    def list_sessions(self, before_id: Optional[int] = None, limit: int = 50) -> Dict:
+        """
+        Get one page of sessions, most recently active first
+        
+        Args:
+            before_id: Return sessions whose last message id is below this (None = newest)
+            limit: Maximum number of sessions
+            
+        Returns:
+            Dict with sessions (session_id, created_at, last_message_at, last_message_id,
+            message_count, last_role), next_before_id and has_more
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            SELECT {_SESSION_COLUMNS}
+            FROM sessions
+            WHERE last_message_id < ?
+            ORDER BY last_message_id DESC
+            LIMIT ?
+        ''', (before_id if before_id is not None else _MAX_ROWID, limit + 1))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        has_more = len(rows) > limit
+        sessions = [_session_row(row) for row in rows[:limit]]
+        
+        return {
+            'sessions': sessions,
+            'next_before_id': sessions[-1]['last_message_id'] if has_more else None,
+            'has_more': has_more
+        }
+    
+    def get_inactive_sessions(self, before: str, limit: int = 1000) -> List[Dict]:
+        """
+        Get sessions whose last message is older than a timestamp (oldest first)
+        
+        Args:
+            before: Timestamp 'YYYY-MM-DD HH:MM:SS' (UTC, as stored by SQLite)
+            limit: Maximum number of sessions
+            
+        Returns:
+            List of session dictionaries
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            SELECT {_SESSION_COLUMNS}
+            FROM sessions
+            WHERE last_message_at < ?
+            ORDER BY last_message_at ASC
+            LIMIT ?
+        ''', (before, limit))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [_session_row(row) for row in rows]
+    
+    def count_inactive_sessions(self, before: str) -> Tuple[int, int]:
+        """
+        Count sessions whose last message is older than a timestamp
+        
+        Args:
+            before: Timestamp 'YYYY-MM-DD HH:MM:SS' (UTC, as stored by SQLite)
+            
+        Returns:
+            (sessions, messages in those sessions)
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT COUNT(*), COALESCE(SUM(message_count), 0)
+            FROM sessions
+            WHERE last_message_at < ?
+        ''', (before,))
+        
+        sessions, messages = cursor.fetchone()
+        conn.close()
+        
+        return sessions, messages
+    
     def delete_conversation(self, session_id: str) -> int:
         """
         Delete all messages for a session
@@ -125,7 +505,7 @@ class Database:
         Returns:
             Number of deleted messages
         """
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -134,12 +514,230 @@ class Database:
         ''', (session_id,))
         
         deleted_count = cursor.rowcount
+        cursor.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
         conn.commit()
         conn.close()
         
         return deleted_count
 
+    
+    def delete_messages_batch(self, session_id: str, max_id: int, limit: int = 500) -> int:
+        """
+        Delete up to limit messages of a session with id <= max_id (one short transaction)
+        
+        Messages written after max_id was read are kept, so a session that
+        becomes active again during retention is not lost.
+        
+        Args:
+            session_id: Session identifier
+            max_id: Highest message id to delete
+            limit: Maximum rows deleted in this transaction
+            
+        Returns:
+            Number of deleted messages
+        """
+        conn = self._connect(timeout=30)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            DELETE FROM conversations
+            WHERE id IN (
+                SELECT id FROM conversations
+                WHERE session_id = ? AND id <= ?
+                ORDER BY id
+                LIMIT ?
+            )
+        ''', (session_id, max_id, limit))
+        
+        deleted_count = cursor.rowcount
+        if deleted_count:
+            # Keep the summary consistent with what is left
+            cursor.execute('''
+                UPDATE sessions SET message_count = message_count - ? WHERE id = ?
+            ''', (deleted_count, session_id))
+        cursor.execute('''
+            DELETE FROM sessions WHERE id = ? AND message_count <= 0
+        ''', (session_id,))
+        conn.commit()
+        conn.close()
+        
+        return deleted_count
+    
+    def get_storage_stats(self) -> Dict:
+        """
+        Database file statistics
+        
+        Returns:
+            Dict with file_bytes, page_size, page_count, freelist_count and auto_vacuum mode
+        """
+        conn = self._connect()
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        freelist_count = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        conn.close()
+        
+        return {
+            'file_bytes': os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+            'page_size': page_size,
+            'page_count': page_count,
+            'freelist_count': freelist_count,
+            'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(auto_vacuum, str(auto_vacuum))
+        }
+    
+    def incremental_vacuum(self, pages: int = 1000) -> int:
+        """
+        Return up to pages free pages to the filesystem (requires auto_vacuum = INCREMENTAL)
+        
+        Returns:
+            Number of pages released
+        """
+        conn = self._connect(timeout=30)
+        before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        # executescript steps the pragma to completion (execute() frees a single page)
+        conn.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+        after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        conn.close()
+        return before - after
+    
+    def enable_incremental_vacuum(self):
+        """
+        Switch an existing database to auto_vacuum = INCREMENTAL
+        
+        Needs one full VACUUM (rewrites the file and blocks writers while it runs).
+        """
+        conn = self._connect(timeout=30)
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        conn.close()
+
 
 # Global database instance
 db = Database()
 
+
+# --- Benchmark ---
+def _bench_history(rows: int = 1_000_000, db_path: Optional[str] = None, session_size: int = 20, big_session: int = 100_000):
+    """
+    Compare legacy full-session reads / session listing with keyset pagination
+    
+    Builds a synthetic database with `rows` messages: sessions of session_size
+    messages plus one session of big_session messages.
+    
+    Usage (from backend/):
+        python -m app.database [rows] [db_path]
+    """
+    import tempfile
+    import time
+    
+    db_path = db_path or os.path.join(tempfile.gettempdir(), f"bench_history_{rows}.db")
+    bench_db = Database(db_path)
+    bench_db.init_database()
+    
+    conn = sqlite3.connect(db_path)
+    existing = conn.execute('SELECT COUNT(*) FROM conversations').fetchone()[0]
+    if existing < rows:
+        print(f"Loading {rows - existing} rows into {db_path} ...")
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        start = time.perf_counter()
+        
+        def generate():
+            for i in range(existing, rows):
+                # Every 10th message goes to the big session, interleaved with the others
+                if i % 10 == 0 and i // 10 < big_session:
+                    session = "big"
+                else:
+                    session = f"s{i // session_size}"
+                yield (session, "user" if i % 2 == 0 else "assistant", f"message {i} about land degradation",
+                       f"2025-01-01 00:{(i // 60) % 60:02d}:{i % 60:02d}")
+        
+        conn.executemany(
+            'INSERT INTO conversations (session_id, role, content, created_at) VALUES (?, ?, ?, ?)',
+            generate()
+        )
+        conn.commit()
+        print(f"  loaded in {time.perf_counter() - start:.1f}s")
+        # Bulk load bypasses save_message: rebuild session summaries
+        conn.execute('DELETE FROM sessions')
+        conn.commit()
+        conn.close()
+        start = time.perf_counter()
+        bench_db.backfill_sessions()
+        print(f"  session summaries backfilled in {time.perf_counter() - start:.1f}s")
+        conn = sqlite3.connect(db_path)
+    conn.execute('ANALYZE')
+    conn.close()
+    
+    def timed(label: str, fn, repeat: int = 5):
+        fn()  # warm page cache
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = fn()
+        elapsed = (time.perf_counter() - start) / repeat * 1000
+        print(f"  {label:<48} {elapsed:10.2f} ms")
+        return result
+    
+    def legacy_conversation(session_id):
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute(
+            'SELECT id, role, content, created_at FROM conversations WHERE session_id = ? ORDER BY created_at ASC',
+            (session_id,)
+        ).fetchall()
+        conn.close()
+        return rows
+    
+    def legacy_sessions():
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute('SELECT DISTINCT session_id FROM conversations ORDER BY MAX(created_at) DESC').fetchall()
+        conn.close()
+        return rows
+    
+    print("=" * 72)
+    print(f"History benchmark: {rows} rows ({db_path})")
+    print("=" * 72)
+    
+    timed("legacy get_conversation (20 msgs, ORDER BY created_at)", lambda: legacy_conversation("s100"))
+    timed("legacy get_conversation (big session)", lambda: legacy_conversation("big"), repeat=2)
+    timed("get_history first page (limit 50, big session)", lambda: bench_db.get_history("big", limit=50))
+    last_id = bench_db.get_history("big", limit=big_session)["messages"][-51]["id"] if rows >= 10 * 51 else 0
+    timed("get_history last page (after_id cursor)", lambda: bench_db.get_history("big", after_id=last_id, limit=50))
+    
+    def aggregate_sessions_page():
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute(
+            'SELECT session_id, COUNT(*), MAX(id) AS last_id FROM conversations '
+            'GROUP BY session_id ORDER BY last_id DESC LIMIT 51'
+        ).fetchall()
+        conn.close()
+        return rows
+    
+    try:
+        legacy_sessions()
+    except sqlite3.OperationalError as e:
+        print(f"  {'legacy get_all_sessions (DISTINCT + MAX)':<48} fails: {e}")
+    timed("GROUP BY aggregate page (no summary table)", aggregate_sessions_page, repeat=2)
+    sessions = timed("get_all_sessions (sessions table)", bench_db.get_all_sessions, repeat=2)
+    print(f"    -> returned {len(sessions)} sessions")
+    page = timed("list_sessions first page (limit 50)", lambda: bench_db.list_sessions(limit=50))
+    timed("list_sessions next page (before_id cursor)",
+          lambda: bench_db.list_sessions(before_id=page["next_before_id"], limit=50))
+    timed("get_session", lambda: bench_db.get_session("s100"))
+    
+    def write_path():
+        bench_db.save_message("bench-writes", "user", "hello")
+    timed("save_message (with session summary upsert)", write_path, repeat=50)
+    
+    conn = sqlite3.connect(db_path)
+    plan = conn.execute(
+        'EXPLAIN QUERY PLAN SELECT id, role, content, created_at FROM conversations '
+        'WHERE session_id = ? AND id > ? ORDER BY id ASC LIMIT ?', ("big", 0, 51)
+    ).fetchall()
+    conn.close()
+    print(f"  get_history plan: {'; '.join(row[-1] for row in plan)}")
+
+
+if __name__ == "__main__":
+    import sys
+    _bench_history(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000, *sys.argv[2:3])
+
@@ -2,11 +2,19 @@
 Query dispatcher - Slot-driven data source routing
 Routes queries to appropriate data sources based on slots (domain, targets, section_hint)
 """
-from typing import List, Dict, Optional
+import asyncio
+import threading
+import time
+from typing import AsyncGenerator, List, Dict, Optional
 from app.engine.targets import extract_targets
+from app.sources.base import Source, FetchStopped
+from app.utils.cancellation import RequestGuard, cancellation_stats
 from app.sources.tabular_combined import TabularCombinedSource
 from app.sources.profiles_iframe import ProfilesIframeSource
 
+# Seconds between client-disconnect checks while waiting on sources
+DISCONNECT_POLL_SECONDS = 0.25
+
 # Registered data sources (priority-ordered)
 SOURCES = [
     TabularCombinedSource(),   # Priority 10 - tables first
@@ -14,6 +22,89 @@ SOURCES = [
 ]
 
 
+def _select_sources(domain: str) -> List[Source]:
+    """
+    Pick the sources that serve a slot domain (priority-ordered)
+    
+    Args:
+        domain: Domain type ("country_profile", "commitment", "legislation")
+        
+    Returns:
+        List of matching sources
+    """
+    selected = []
+    for source in sorted(SOURCES, key=lambda s: s.priority):
+        source_name = source.__class__.__name__
+        
+        # Determine if source should handle this domain
+        should_fetch = False
+        
+        if source_name == "TabularCombinedSource":
+            # Tables for commitment and legislation domains
+            should_fetch = domain in ("commitment", "legislation")
+        elif source_name == "ProfilesIframeSource":
+            # Iframes for country_profile domain
+            should_fetch = domain == "country_profile"
+        
+        if should_fetch:
+            print(f"✓ Source matched: {source_name} (priority: {source.priority})")
+            selected.append(source)
+        else:
+            print(f"✗ Source not matched: {source_name} (domain={domain})")
+    return selected
+
+
+def _fetch_source(
+    source: Source,
+    domain: str,
+    targets: List[str],
+    section_hint: Optional[str],
+    stop: Optional[threading.Event] = None
+) -> List[Dict]:
+    """
+    Fetch hits from one source; errors are logged and yield no hits
+    
+    With a stop flag (set when the client disconnects), a fetch that has not
+    started yet is skipped and a running one is asked to return early; either
+    way its hits are discarded.
+    """
+    source_name = source.__class__.__name__
+    if stop is not None and stop.is_set():
+        cancellation_stats.record_fetch(source_name, 0.0, stopped=True, cancelled=True)
+        print(f"  → {source_name}: skipped (client disconnected)")
+        return []
+    
+    start = time.perf_counter()
+    try:
+        # Build a pseudo-query for backward compatibility with existing fetch() methods
+        # This will be refactored later to pass slots directly
+        pseudo_query = f"{domain} {' '.join(targets)}"
+        if section_hint:
+            pseudo_query += f" {section_hint}"
+        
+        hits = source.fetch(pseudo_query, targets, stop=stop)
+    except FetchStopped:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        cancellation_stats.record_fetch(source_name, elapsed_ms, stopped=True, cancelled=True)
+        print(f"  → {source_name}: stopped after {elapsed_ms:.0f} ms (client disconnected)")
+        return []
+    except Exception as e:
+        print(f"  ⚠️  Error fetching from {source_name}: {e}")
+        return []
+    
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    cancelled = stop is not None and stop.is_set()
+    if cancelled:
+        # Ran to completion (the flag came too late or the source ignores it)
+        cancellation_stats.record_fetch(source_name, elapsed_ms, stopped=False, cancelled=True)
+        print(f"  → {source_name}: finished after client disconnect, {len(hits)} results discarded")
+        return []
+    
+    cancellation_stats.record_fetch(source_name, elapsed_ms, stopped=False, cancelled=False)
+    print(f"  → {source_name}: fetched {len(hits)} results")
+    return hits
+
+
 def run_slot_query(
     domain: str,
     targets: List[str],
@@ -38,37 +129,93 @@ def run_slot_query(
     print(f"🎯 Slot-driven query: domain={domain}, targets={targets}, section_hint={section_hint}")
     
     all_hits: List[Dict] = []
+    for source in _select_sources(domain):
+        all_hits.extend(_fetch_source(source, domain, targets, section_hint))
     
-    # Route based on domain
-    for source in sorted(SOURCES, key=lambda s: s.priority):
-        source_name = source.__class__.__name__
-        
-        # Determine if source should handle this domain
-        should_fetch = False
-        
-        if source_name == "TabularCombinedSource":
-            # Tables for commitment and legislation domains
-            should_fetch = domain in ("commitment", "legislation")
-        elif source_name == "ProfilesIframeSource":
-            # Iframes for country_profile domain
-            should_fetch = domain == "country_profile"
+    return {
+        "targets": targets,
+        "hits": all_hits,
+        "domain": domain,
+        "section_hint": section_hint
+    }
+
+
+async def stream_slot_query(
+    domain: str,
+    targets: List[str],
+    section_hint: Optional[str] = None,
+    iso3_codes: Optional[List[str]] = None,
+    guard: Optional[RequestGuard] = None,
+    poll_interval: float = DISCONNECT_POLL_SECONDS
+) -> AsyncGenerator[Dict, None]:
+    """
+    Slot-driven query that yields each source's hits as soon as they arrive
+    
+    Sources are fetched concurrently in worker threads; a slow source does not
+    hold back faster ones. Closing the generator early sets the stop flag
+    (guard.stop) so fetches still pending skip or stop their work.
+    
+    Args:
+        domain: Domain type ("country_profile", "commitment", "legislation")
+        targets: List of target keys (country names or region keys)
+        section_hint: Optional section hint (e.g., "stressors/fires")
+        iso3_codes: Optional list of ISO3 country codes
+        guard: Optional request guard; raises ClientDisconnected while waiting
+            on sources once the client is gone (pending fetches are stopped)
+        poll_interval: Seconds between disconnect checks while waiting
         
-        if should_fetch:
-            print(f"✓ Source matched: {source_name} (priority: {source.priority})")
-            try:
-                # Build a pseudo-query for backward compatibility with existing fetch() methods
-                # This will be refactored later to pass slots directly
-                pseudo_query = f"{domain} {' '.join(targets)}"
-                if section_hint:
-                    pseudo_query += f" {section_hint}"
-                
-                hits = source.fetch(pseudo_query, targets)
-                print(f"  → Fetched {len(hits)} results")
-                all_hits.extend(hits)
-            except Exception as e:
-                print(f"  ⚠️  Error fetching from {source_name}: {e}")
-        else:
-            print(f"✗ Source not matched: {source_name} (domain={domain})")
+    Yields:
+        Dicts with source name and hits, in completion order
+    """
+    print(f"🎯 Slot-driven stream: domain={domain}, targets={targets}, section_hint={section_hint}")
+    
+    stop = guard.stop if guard else threading.Event()
+    tasks = {
+        asyncio.ensure_future(asyncio.to_thread(_fetch_source, source, domain, targets, section_hint, stop)):
+            source.__class__.__name__
+        for source in _select_sources(domain)
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=poll_interval if guard else None,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield {"source": tasks[task], "hits": task.result()}
+            if guard and pending:
+                await guard.check("source fetch")
+    finally:
+        if pending:
+            # Cancelling the tasks only stops waiting; the threads see the flag
+            stop.set()
+        for task in pending:
+            task.cancel()
+
+
+async def run_slot_query_async(
+    domain: str,
+    targets: List[str],
+    section_hint: Optional[str] = None,
+    iso3_codes: Optional[List[str]] = None,
+    guard: Optional[RequestGuard] = None
+) -> Dict:
+    """
+    Async run_slot_query: sources are fetched concurrently and the query is
+    abandoned (ClientDisconnected) as soon as the guarded client disconnects
+    
+    Returns:
+        Same dict as run_slot_query (hits in source priority order)
+    """
+    by_source: Dict[str, List[Dict]] = {}
+    async for result in stream_slot_query(domain, targets, section_hint, iso3_codes, guard=guard):
+        by_source[result["source"]] = result["hits"]
+    
+    all_hits: List[Dict] = []
+    for source in sorted(SOURCES, key=lambda s: s.priority):
+        all_hits.extend(by_source.pop(source.__class__.__name__, []))
     
     return {
         "targets": targets,
@@ -0,0 +1,241 @@
+"""
+Background PDF export jobs
+Rendering runs in a process pool; finished PDFs are cached per (session_id, last message id)
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+# Worker processes for PDF rendering
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+# Total bytes of finished PDFs kept in memory
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Seconds finished/failed jobs stay queryable
+EXPORT_JOB_TTL = int(os.getenv("EXPORT_JOB_TTL", "3600"))
+
+# Cache key: (session_id, id of the last message in the conversation)
+ExportKey = Tuple[str, int]
+
+
+def _worker_context():
+    """
+    Start method for render workers
+
+    Never fork the server process itself: it runs the event loop and several
+    threads (SQLite store, BM25 merges, retention), and a forked child can
+    deadlock on a lock one of them held. forkserver forks workers from a clean
+    single-threaded process (with the PDF renderer preloaded); spawn elsewhere.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["app.utils.pdf"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class ExportJob:
+    """State of one export job"""
+
+    def __init__(self, session_id: str, key: ExportKey):
+        self.job_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.key = key
+        self.status = "queued"  # queued -> running -> done | failed
+        self.error: Optional[str] = None
+        self.cached = False
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        data = {
+            "job_id": self.job_id,
+            "session_id": self.session_id,
+            "status": self.status,
+            "cached": self.cached,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+        if self.error:
+            data["error"] = self.error
+        if self.status == "done":
+            data["download_url"] = f"/export/jobs/{self.job_id}/download"
+        return data
+
+
+class ExportJobQueue:
+    """
+    Export job registry backed by a process pool
+
+    Identical requests (same session and last message) share one job while it
+    runs, and reuse the cached PDF once it is done.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = EXPORT_WORKERS,
+        cache_max_bytes: int = EXPORT_CACHE_MAX_BYTES,
+        job_ttl: int = EXPORT_JOB_TTL
+    ):
+        self.max_workers = max_workers
+        self.cache_max_bytes = cache_max_bytes
+        self.job_ttl = job_ttl
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, ExportJob] = {}
+        self._running: Dict[ExportKey, ExportJob] = {}
+        self._cache: "OrderedDict[ExportKey, bytes]" = OrderedDict()
+        self._cache_bytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created on first use so importing the app does not start workers (caller holds the lock)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_worker_context())
+        return self._executor
+
+    def submit(self, session_id: str, messages: List[Dict]) -> ExportJob:
+        """
+        Enqueue a PDF export
+
+        Args:
+            session_id: Session identifier
+            messages: Conversation messages (non-empty, oldest first)
+
+        Returns:
+            New job, or the job already exporting the same conversation state
+        """
+        from app.utils.pdf import render_conversation_pdf_bytes
+
+        key = (session_id, max(m["id"] for m in messages))
+        with self._lock:
+            self._prune()
+
+            running = self._running.get(key)
+            if running is not None:
+                return running
+
+            job = ExportJob(session_id, key)
+            self._jobs[job.job_id] = job
+
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                job.status = "done"
+                job.cached = True
+                job.finished_at = time.time()
+                return job
+
+            self.cache_misses += 1
+            self._running[key] = job
+            executor = self._get_executor()
+
+        # Outside the lock: a future that fails immediately runs _finish in this thread
+        try:
+            future = executor.submit(render_conversation_pdf_bytes, session_id, messages)
+        except Exception as e:
+            # Pool broken by a dead worker (e.g. OOM) or shut down: fail this job
+            # instead of leaving it "queued", and let the next submit start a new pool
+            self._fail(job, e, executor)
+            return job
+        job.status = "running"
+        future.add_done_callback(lambda f, job=job, executor=executor: self._finish(job, f, executor))
+        return job
+
+    def _finish(self, job: ExportJob, future: Future, executor: ProcessPoolExecutor):
+        try:
+            pdf = future.result()
+        except Exception as e:
+            self._fail(job, e, executor if isinstance(e, BrokenProcessPool) else None)
+            return
+        with self._lock:
+            self._running.pop(job.key, None)
+            self._cache_put(job.key, pdf)
+            job.status = "done"
+            job.finished_at = time.time()
+
+    def _fail(self, job: ExportJob, error: Exception, broken: Optional[ProcessPoolExecutor] = None):
+        """Mark a job failed; broken is a pool to discard (the next submit creates a new one)"""
+        with self._lock:
+            if self._running.get(job.key) is job:
+                del self._running[job.key]
+            job.status = "failed"
+            job.error = str(error) or type(error).__name__
+            job.finished_at = time.time()
+            discard = broken is not None and self._executor is broken
+            if discard:
+                self._executor = None
+        print(f"⚠️  Export job {job.job_id} failed: {job.error}")
+        if discard:
+            print("⚠️  Export process pool unusable; a new one is created on the next export")
+            broken.shutdown(wait=False)
+
+    def _cache_put(self, key: ExportKey, pdf: bytes):
+        if len(pdf) > self.cache_max_bytes:
+            return
+        old = self._cache.pop(key, None)
+        if old is not None:
+            self._cache_bytes -= len(old)
+        self._cache[key] = pdf
+        self._cache_bytes += len(pdf)
+        while self._cache_bytes > self.cache_max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+
+    def _prune(self):
+        """Drop finished jobs older than the TTL (caller holds the lock)"""
+        cutoff = time.time() - self.job_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get_job(self, job_id: str) -> Optional[ExportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get_pdf(self, job: ExportJob) -> Optional[bytes]:
+        """PDF bytes of a finished job (None if evicted from the cache)"""
+        with self._lock:
+            pdf = self._cache.get(job.key)
+            if pdf is not None:
+                self._cache.move_to_end(job.key)
+            return pdf
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "workers": self.max_workers,
+                "jobs": counts,
+                "cache": {
+                    "entries": len(self._cache),
+                    "bytes": self._cache_bytes,
+                    "max_bytes": self.cache_max_bytes,
+                    "hits": self.cache_hits,
+                    "misses": self.cache_misses,
+                    "hit_ratio": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+                },
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global export queue instance
+export_jobs = ExportJobQueue()
@@ -1,16 +1,244 @@
 """
-Health check endpoint for monitoring
+Health, readiness and statistics endpoints for monitoring
+
+/health  liveness (process is up)
+/ready   readiness: 200 once warmup finished, the schema is current and data
+         files are present (503 otherwise); includes the data version
+/stats   per-worker detail: data files, source indexes, caches, database,
+         admission control, rate limits
+
+data_version is derived from the content hashes of the data files, so
+comparing it across workers (or deploys) shows whether they serve the same data.
 """
-from fastapi import APIRouter
-from datetime import datetime
+import asyncio
+import hashlib
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 
-router = APIRouter()
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+from app.schemas import HealthResponse
+
+router = APIRouter(tags=["health"])
+
+# Worker start time (module import)
+STARTED_AT = time.time()
+
+# Hash read size
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+# abspath -> ((mtime_ns, size), sha256); rehashed only when the file changes
+_FINGERPRINTS: Dict[str, Tuple[Tuple[int, int], str]] = {}
+_FINGERPRINT_LOCK = threading.Lock()
+
+
+def file_fingerprint(path: str) -> Optional[Dict]:
+    """
+    Content hash and metadata of a file (hash cached until mtime/size change)
+
+    Args:
+        path: File path
+
+    Returns:
+        Dict with path, sha256, size and mtime, or None if the file is missing
+    """
+    if not path or not os.path.exists(path):
+        return None
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+
+    with _FINGERPRINT_LOCK:
+        cached = _FINGERPRINTS.get(path)
+    if cached and cached[0] == version:
+        digest = cached[1]
+    else:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with _FINGERPRINT_LOCK:
+            _FINGERPRINTS[path] = (version, digest)
+
+    return {"path": path, "sha256": digest, "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def data_files() -> Dict[str, Optional[Dict]]:
+    """Fingerprints of the data files served by the sources"""
+    from app.config.paths import get_combined_path, get_hits_path
 
-@router.get("/health")
-async def health_check():
-    """Simple health check endpoint"""
     return {
-        "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
-        "service": "geogli-chatbot-backend"
+        "combined": file_fingerprint(get_combined_path()),
+        "hits": file_fingerprint(get_hits_path()),
     }
+
+
+def data_version(files: Dict[str, Optional[Dict]]) -> str:
+    """Short hash over all data file hashes ("none" without data)"""
+    hashes = [f"{name}:{info['sha256']}" for name, info in sorted(files.items()) if info]
+    if not hashes:
+        return "none"
+    return hashlib.sha256("\n".join(hashes).encode()).hexdigest()[:12]
+
+
+def _worker_info() -> Dict:
+    return {
+        "pid": os.getpid(),
+        # Set by app.serve (None when run by plain uvicorn)
+        "worker_id": os.getenv("APP_WORKER_ID"),
+        "started_at": STARTED_AT,
+        "uptime_s": round(time.time() - STARTED_AT, 1),
+        "python": sys.version.split()[0],
+    }
+
+
+def _database_stats() -> Dict:
+    from app.database import SCHEMA_VERSION
+    from app.storage import DATABASE_URL, get_store
+
+    store = get_store()
+    db = store.get_database()
+    stats = {
+        "url": DATABASE_URL,
+        # No schema or file for non-SQLite stores
+        "schema_version": db.schema_version() if db is not None else None,
+        "expected_schema_version": SCHEMA_VERSION if db is not None else None,
+        "store": store.get_stats(),
+    }
+    if db is not None:
+        try:
+            stats["storage"] = db.get_storage_stats()
+        except Exception as e:
+            stats["error"] = str(e)
+    return stats
+
+
+def _cache_stats(request: Request) -> Dict:
+    from app.utils.compression import get_compression_stats
+    from app.utils.cancellation import get_cancellation_stats
+    from app.export_jobs import export_jobs
+
+    caches = {
+        "compression": get_compression_stats(),
+        "cancellation": get_cancellation_stats(),
+        "export_jobs": export_jobs.get_stats(),
+    }
+    # Only report what this worker has actually loaded
+    if "app.search.tokenizer" in sys.modules:
+        from app.search.tokenizer import query_cache_info
+        caches["tokenizer"] = query_cache_info()
+    bm25_stores = getattr(request.app.state, "bm25_stores", None)
+    if bm25_stores:
+        caches["bm25"] = {name: store.get_stats()["cache"] for name, store in bm25_stores.items()}
+    return caches
+
+
+def _source_stats() -> Dict:
+    from app.engine.dispatcher import SOURCES
+    from app.sources.tabular_combined import get_index_stats
+
+    indexes = get_index_stats()
+    return {
+        "sources": [
+            {"name": source.__class__.__name__, "priority": source.priority}
+            for source in sorted(SOURCES, key=lambda s: s.priority)
+        ],
+        "indexes": indexes,
+        "documents": sum(index["records"] for index in indexes.values()),
+        "last_reload_at": max((index["loaded_at"] for index in indexes.values()), default=None),
+    }
+
+
+def readiness() -> Tuple[bool, Dict]:
+    """
+    Readiness checks (blocking: may hash changed data files)
+
+    Returns:
+        (ready, report)
+    """
+    from app.database import SCHEMA_VERSION
+    from app.storage import get_database
+    from app.warmup import warmup_state
+
+    files = data_files()
+    warmup = warmup_state.get_stats()
+    db = get_database()
+    schema_version = db.schema_version() if db is not None else None
+
+    problems: List[str] = []
+    if not warmup["ready"]:
+        problems.append(f"warmup {warmup['status']}")
+    if db is not None and schema_version != SCHEMA_VERSION:
+        problems.append(f"schema v{schema_version}, expected v{SCHEMA_VERSION}")
+    if not any(files.values()):
+        problems.append("no data files found")
+
+    return not problems, {
+        "status": "ready" if not problems else "not_ready",
+        "problems": problems,
+        "data_version": data_version(files),
+        "schema_version": schema_version,
+        "warmup": {"status": warmup["status"], "duration_ms": warmup["duration_ms"]},
+        "worker": _worker_info(),
+    }
+
+
+@router.get("/health", response_model=HealthResponse)
+async def health_check():
+    """Liveness check (no dependencies)"""
+    return HealthResponse(status="ok")
+
+
+@router.get("/ready")
+async def ready_check():
+    """
+    Readiness check
+
+    Returns:
+        200 with the data version when ready, 503 with the failing checks otherwise
+    """
+    ready, report = await asyncio.to_thread(readiness)
+    if not ready:
+        return JSONResponse(status_code=503, content=report, headers={"Retry-After": "1"})
+    return report
+
+
+@router.get("/stats")
+async def stats(request: Request):
+    """
+    Worker statistics: data files and version, source indexes, caches, database,
+    warmup, admission control, rate limits
+
+    Returns:
+        Stats dictionary
+    """
+    from app.warmup import warmup_state
+
+    def collect() -> Dict:
+        files = data_files()
+        from app.utils.memory import process_memory
+        return {
+            "worker": {**_worker_info(), "memory": process_memory()},
+            "data_version": data_version(files),
+            "data_files": files,
+            "sources": _source_stats(),
+            "caches": _cache_stats(request),
+            "database": _database_stats(),
+            "warmup": warmup_state.get_stats(),
+        }
+
+    result = await asyncio.to_thread(collect)
+    # Event-loop state, read here rather than in the worker thread
+    from app.utils.admission import get_admission_stats
+    from app.utils.ratelimit import get_rate_limit_stats
+    result["admission"] = get_admission_stats()
+    result["rate_limit"] = get_rate_limit_stats()
+    retention = getattr(request.app.state, "retention", None)
+    if retention is not None:
+        result["database"]["retention"] = retention.get_stats()
+    return result
@@ -2,8 +2,10 @@
 FastAPI main application for UNCCD GeoGLI chatbot
 Provides health check and streaming query endpoints
 """
+import asyncio
 import os
 import time
+from contextlib import asynccontextmanager
 from typing import Optional
 from fastapi import FastAPI, Request, Query, HTTPException
 from fastapi.responses import StreamingResponse, JSONResponse
@@ -11,11 +13,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 
-from app.schemas import HealthResponse, QueryResponse, ErrorResponse
+from app.schemas import QueryResponse, ErrorResponse
 from app.utils.ids import get_session_id_from_request
-from app.utils.sse import create_sse_stream, get_sse_headers
-from app.routes import export, dify
-from app.database import db
+from app.utils.sse import create_slot_sse_stream, get_sse_headers
+from app.utils.cancellation import RequestGuard, ClientDisconnected
+from app.routes import export, dify, history
+from app import health
+from app.storage import get_database
 
 # Load environment variables
 load_dotenv()
@@ -26,13 +30,65 @@ RAG_BM25_ENABLED = os.getenv("RAG_BM25_ENABLED", "true").lower() == "true"
 # Dense RAG configuration (disabled for MVP)
 RAG_DENSE_ENABLED = os.getenv("RAG_DENSE_ENABLED", "false").lower() == "true"
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks"""
+    from app.warmup import WARMUP_ENABLED, run_warmup, mark_ready_without_warmup
+    from app.retention import RETENTION_ENABLED
+    
+    # Create/migrate the schema before serving instead of at import time
+    # (off the event loop; first-use initialization covers tools and tests).
+    # Only SQLite stores (DATABASE_URL) have a schema and a file to compact.
+    database = get_database()
+    if database is not None:
+        await asyncio.to_thread(database.init_database)
+    
+    # Warm indexes and caches in the background; /api/dify/health answers 503
+    # until this finishes, so the load balancer holds traffic back meanwhile
+    if WARMUP_ENABLED:
+        app.state.warmup_task = asyncio.create_task(asyncio.to_thread(run_warmup))
+    else:
+        mark_ready_without_warmup()
+    
+    # Retention/compaction of the conversations database (background thread;
+    # one per deployment: only worker 0 when started by app.serve)
+    if RETENTION_ENABLED and os.getenv("APP_WORKER_ID", "0") == "0":
+        if database is None:
+            print("⚠️  Retention skipped: DATABASE_URL is not a SQLite database")
+        else:
+            from app.retention import RetentionEngine
+            app.state.retention = RetentionEngine(database)
+            app.state.retention.start()
+    
+    yield
+    
+    if getattr(app.state, "retention", None) is not None:
+        app.state.retention.stop()
+    from app.export_jobs import export_jobs
+    export_jobs.shutdown()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="UNCCD GeoGLI Chatbot",
     description="Minimal chatbot for UNCCD Global Land Indicator queries",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Shed load on query endpoints (503 + Retry-After) instead of queueing inside uvicorn.
+# Added before CORS so it runs inside it: rejections still carry CORS headers.
+from app.utils.admission import AdmissionMiddleware, ADMISSION_ENABLED
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
+
+# Per-client token buckets (user/session/IP); outside admission control so
+# clients over their quota never take a concurrency slot
+from app.utils.ratelimit import RateLimitMiddleware, RATE_LIMIT_ENABLED
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 # Configure CORS
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:8080").split(",")
 app.add_middleware(
@@ -43,6 +99,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON/table payloads (/query, /api/dify/chat, /static-data)
+from app.utils.compression import CompressionMiddleware, COMPRESSION_ENABLED
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
 # BM25 stores initialization - DISABLED (moved to slot-driven dispatcher)
 # if RAG_BM25_ENABLED:
 #     try:
@@ -87,59 +148,44 @@ else:
 # Include routers
 app.include_router(export.router)
 app.include_router(dify.router)
+app.include_router(history.router)
+app.include_router(health.router)
 
 
-@app.get("/health", response_model=HealthResponse)
-async def health_check():
-    """Health check endpoint"""
-    return HealthResponse(status="ok")
-
-
-# Streaming endpoint - DISABLED (depends on LangGraph)
-# @app.get("/query/stream")
-# async def stream_query(
-#     request: Request,
-#     q: str = Query(..., max_length=4000, description="User query message"),
-#     session_id: Optional[str] = Query(None, description="Session identifier"),
-#     route_hint: Optional[str] = Query("auto", regex="^(A|B|auto)$", description="Routing hint"),
-#     top_k: Optional[int] = Query(None, ge=1, le=20, description="Number of documents to retrieve")
-# ):
-#     """
-#     Streaming query endpoint using Server-Sent Events (SSE)
-#     
-#     Returns:
-#         text/event-stream with token and final events
-#     """
-#     try:
-#         # Get or generate session ID
-#         header_session_id = request.headers.get("X-Session-Id")
-#         final_session_id = get_session_id_from_request(session_id, header_session_id)
-#         
-#         # Set default top_k if not provided
-#         if top_k is None:
-#             top_k = int(os.getenv("TOP_K", "6"))
-#         
-#         # Create SSE stream
-#         stream = create_sse_stream(
-#             session_id=final_session_id,
-#             message=q,
-#             route_hint=route_hint,
-#             top_k=top_k
-#         )
-#         
-#         # Create streaming response with proper headers
-#         headers = get_sse_headers()
-#         headers["X-Session-Id"] = final_session_id
-#         
-#         return StreamingResponse(
-#             stream,
-#             media_type="text/event-stream",
-#             headers=headers
-#         )
-#         
-#     except Exception as e:
-#         # Return error as JSON for non-streaming errors
-#         raise HTTPException(status_code=500, detail=str(e))
+@app.get("/query/stream")
+async def stream_query(
+    request: Request,
+    q: str = Query(..., max_length=4000, description="User query message"),
+    session_id: Optional[str] = Query(None, description="Session identifier"),
+):
+    """
+    Streaming query endpoint using Server-Sent Events (SSE)
+    
+    Slot-driven like /query, but results are sent progressively:
+    slots, then hits per source as each arrives, then done (heartbeats while waiting)
+    
+    Returns:
+        text/event-stream with slots, hits, heartbeat, done and error events
+    """
+    # Get or generate session ID
+    header_session_id = request.headers.get("X-Session-Id")
+    final_session_id = get_session_id_from_request(session_id, header_session_id)
+    
+    stream = create_slot_sse_stream(
+        request=request,
+        session_id=final_session_id,
+        message=q
+    )
+    
+    # Create streaming response with proper headers
+    headers = get_sse_headers()
+    headers["X-Session-Id"] = final_session_id
+    
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers=headers
+    )
 
 
 from pydantic import BaseModel
@@ -180,6 +226,7 @@ async def _handle_query_common(request: Request, q: str | None, route_hint: str
         
         # Process query
         start_time = time.time()
+        guard = RequestGuard(request, "query")
         
         # Step 1: Extract slots from query
         from app.search.router_intent import route as route_intent
@@ -191,17 +238,21 @@ async def _handle_query_common(request: Request, q: str | None, route_hint: str
         
         print(f"🎯 /query - Slots: domain={domain}, targets={targets}, section_hint={section_hint}")
         
-        # Step 2: Call dispatcher to get structured hits
-        from app.engine.dispatcher import run_slot_query
+        # Step 2: Call dispatcher to get structured hits (abandoned if the client leaves)
+        from app.engine.dispatcher import run_slot_query_async
         
-        result = run_slot_query(
+        await guard.check("dispatch")
+        result = await run_slot_query_async(
             domain=domain,
             targets=targets,
             section_hint=section_hint,
-            iso3_codes=slots.get("iso3_codes", [])
+            iso3_codes=slots.get("iso3_codes", []),
+            guard=guard
         )
         
         hits = result.get("hits", [])
+        await guard.check("response")
+        guard.done()
         
         # Calculate latency
         latency_ms = int((time.time() - start_time) * 1000)
@@ -221,6 +272,10 @@ async def _handle_query_common(request: Request, q: str | None, route_hint: str
         
         return json_response
         
+    except ClientDisconnected as e:
+        guard.cancelled(e.stage)
+        # Nobody is listening; 499 = client closed request
+        return JSONResponse({"detail": "client disconnected"}, status_code=499)
     except HTTPException:
         raise
     except Exception as e:
@@ -84,6 +84,20 @@ class EmbeddingProvider:
     #     return sample_embedding.shape[0]
 
 
-# Global instance - DISABLED
-embedding_provider = EmbeddingProvider()
+# Global instance - DISABLED (built on first access, not at import)
+_embedding_provider = None
+
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """Get the shared EmbeddingProvider (created on first use)"""
+    global _embedding_provider
+    if _embedding_provider is None:
+        _embedding_provider = EmbeddingProvider()
+    return _embedding_provider
+
+
+def __getattr__(name: str):
+    if name == "embedding_provider":
+        return get_embedding_provider()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
@@ -93,5 +93,21 @@ class DenseRetriever:
 
 
 # Global instance - DISABLED
-dense_retriever = DenseRetriever()
+# Created on first access (`from app.rag.retriever import dense_retriever` still works),
+# so importing this module has no side effects
+_dense_retriever = None
+
+
+def get_dense_retriever() -> DenseRetriever:
+    """Get the shared DenseRetriever (created on first use)"""
+    global _dense_retriever
+    if _dense_retriever is None:
+        _dense_retriever = DenseRetriever()
+    return _dense_retriever
+
+
+def __getattr__(name: str):
+    if name == "dense_retriever":
+        return get_dense_retriever()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
@@ -181,5 +181,20 @@ class FAISSVectorStore:
 
 
 # Global instance - DISABLED
-vector_store = FAISSVectorStore()
+# Resolved lazily through the module __getattr__ below
+_vector_store = None
+
+
+def get_vector_store() -> FAISSVectorStore:
+    """Get the shared FAISSVectorStore (created on first use)"""
+    global _vector_store
+    if _vector_store is None:
+        _vector_store = FAISSVectorStore()
+    return _vector_store
+
+
+def __getattr__(name: str):
+    if name == "vector_store":
+        return get_vector_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
@@ -0,0 +1,263 @@
+"""
+Retention and compaction for the conversations database
+Expires old sessions (by age and/or database size), optionally archives them
+to gzip JSONL, deletes in short batches and reclaims space incrementally
+
+Usage (one pass, from backend/):
+    python -m app.retention [--dry-run] [--enable-incremental-vacuum]
+"""
+import gzip
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from app.database import Database
+
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "false").lower() == "true"
+# Sessions idle for longer than this are expired (0 = no age limit)
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "90"))
+# Oldest sessions are expired while the database file is larger than this (0 = no size limit)
+RETENTION_MAX_DB_MB = float(os.getenv("RETENTION_MAX_DB_MB", "0"))
+# Sessions active more recently than this are never expired by the size policy
+RETENTION_MIN_AGE_HOURS = float(os.getenv("RETENTION_MIN_AGE_HOURS", "24"))
+# Messages deleted per transaction (keeps write locks short)
+RETENTION_BATCH_ROWS = int(os.getenv("RETENTION_BATCH_ROWS", "500"))
+# Free pages released per incremental vacuum step
+RETENTION_VACUUM_PAGES = int(os.getenv("RETENTION_VACUUM_PAGES", "1000"))
+# Seconds between background passes
+RETENTION_INTERVAL_SECONDS = int(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+# Directory for gzip JSONL archives of expired sessions (empty = delete without archiving)
+RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR", "")
+
+# Pause after every delete/vacuum transaction (ms). Waiting writers retry with
+# SQLite's busy-handler backoff (up to 100 ms), so short gaps would starve them
+RETENTION_PAUSE_MS = float(os.getenv("RETENTION_PAUSE_MS", "20"))
+
+# Sessions examined per selection query
+_SESSION_BATCH = 200
+
+
+def _sqlite_timestamp(dt: datetime) -> str:
+    """Format like SQLite CURRENT_TIMESTAMP (UTC)"""
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class RetentionEngine:
+    """
+    Applies retention policies to a Database
+
+    Each pass:
+    1. Age policy: expire sessions idle for more than max_age_days
+    2. Size policy: expire oldest sessions while the file exceeds max_db_mb
+    3. Release free pages with incremental vacuum
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        max_age_days: float = RETENTION_DAYS,
+        max_db_mb: float = RETENTION_MAX_DB_MB,
+        min_age_hours: float = RETENTION_MIN_AGE_HOURS,
+        batch_rows: int = RETENTION_BATCH_ROWS,
+        vacuum_pages: int = RETENTION_VACUUM_PAGES,
+        archive_dir: Optional[str] = RETENTION_ARCHIVE_DIR or None,
+        interval_seconds: int = RETENTION_INTERVAL_SECONDS,
+        pause_ms: float = RETENTION_PAUSE_MS
+    ):
+        self.db = database
+        self.max_age_days = max_age_days
+        self.max_db_mb = max_db_mb
+        self.min_age_hours = min_age_hours
+        self.batch_rows = batch_rows
+        self.vacuum_pages = vacuum_pages
+        self.archive_dir = archive_dir
+        self.interval_seconds = interval_seconds
+        self.pause_seconds = pause_ms / 1000
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_report: Optional[Dict] = None
+
+    # --- Policies ---
+    def _expire_before(self, cutoff: datetime, report: Dict, dry_run: bool, until_size_bytes: Optional[int] = None):
+        """Expire sessions idle since before cutoff, oldest first (optionally only until the size target is met)"""
+        cutoff_ts = _sqlite_timestamp(cutoff)
+        if dry_run:
+            # Everything due, not just the first batch (one indexed aggregate)
+            sessions, messages = self.db.count_inactive_sessions(cutoff_ts)
+            report["sessions"] += sessions
+            report["messages"] += messages
+            return
+        seen = set()
+        while not self._stop.is_set():
+            if until_size_bytes is not None and self._used_bytes() <= until_size_bytes:
+                return
+            sessions = self.db.get_inactive_sessions(cutoff_ts, limit=_SESSION_BATCH)
+            # Stop if nothing new is selected (e.g. a summary that could not be cleared)
+            sessions = [s for s in sessions if s["session_id"] not in seen]
+            if not sessions:
+                return
+            for session in sessions:
+                seen.add(session["session_id"])
+                self._expire_session(session, report)
+                if until_size_bytes is not None and self._used_bytes() <= until_size_bytes:
+                    return
+
+    def _used_bytes(self) -> int:
+        """Bytes in use (file size minus free pages awaiting vacuum)"""
+        stats = self.db.get_storage_stats()
+        return (stats["page_count"] - stats["freelist_count"]) * stats["page_size"]
+
+    def _expire_session(self, session: Dict, report: Dict):
+        session_id = session["session_id"]
+        max_id = session["last_message_id"]
+
+        if self.archive_dir:
+            report["archived_bytes"] += self._archive_session(session_id, max_id)
+
+        deleted = 0
+        while True:
+            batch = self.db.delete_messages_batch(session_id, max_id, limit=self.batch_rows)
+            deleted += batch
+            # Yield the write lock to application writers
+            time.sleep(self.pause_seconds)
+            if batch < self.batch_rows:
+                break
+
+        report["sessions"] += 1
+        report["messages"] += deleted
+
+    def _archive_session(self, session_id: str, max_id: int) -> int:
+        """Append a session's messages (id <= max_id) to today's gzip JSONL archive"""
+        from itertools import takewhile
+        from app.utils.exporters import iter_jsonl
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(
+            self.archive_dir,
+            f"conversations-{datetime.now(timezone.utc).strftime('%Y%m%d')}.jsonl.gz"
+        )
+        messages = takewhile(lambda m: m["id"] <= max_id, self.db.iter_conversation(session_id))
+
+        written = 0
+        # Appending adds a gzip member; readers (gzip, zcat) see one continuous stream
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for chunk in iter_jsonl(session_id, messages):
+                f.write(chunk)
+                written += len(chunk)
+        return written
+
+    def _vacuum(self, report: Dict):
+        while not self._stop.is_set():
+            released = self.db.incremental_vacuum(self.vacuum_pages)
+            report["pages_released"] += released
+            if released < self.vacuum_pages:
+                return
+            time.sleep(self.pause_seconds)
+
+    # --- Passes ---
+    def run_once(self, dry_run: bool = False) -> Dict:
+        """
+        Run one retention pass
+
+        Args:
+            dry_run: Only count what the age policy would expire
+
+        Returns:
+            Report with expired sessions/messages, archived bytes, released pages and sizes
+        """
+        with self._lock:
+            start = time.perf_counter()
+            now = datetime.now(timezone.utc)
+            before = self.db.get_storage_stats()
+            report = {
+                "dry_run": dry_run,
+                "sessions": 0,
+                "messages": 0,
+                "archived_bytes": 0,
+                "pages_released": 0,
+                "bytes_before": before["file_bytes"],
+            }
+
+            if self.max_age_days > 0:
+                self._expire_before(now - timedelta(days=self.max_age_days), report, dry_run)
+
+            if self.max_db_mb > 0 and not dry_run:
+                target = int(self.max_db_mb * 1024 * 1024)
+                if self._used_bytes() > target:
+                    self._expire_before(
+                        now - timedelta(hours=self.min_age_hours), report, dry_run, until_size_bytes=target
+                    )
+
+            if not dry_run:
+                if before["auto_vacuum"] == "incremental":
+                    self._vacuum(report)
+                else:
+                    report["vacuum"] = "skipped (auto_vacuum is not incremental; run enable_incremental_vacuum once)"
+
+            report["bytes_after"] = self.db.get_storage_stats()["file_bytes"]
+            report["duration_s"] = round(time.perf_counter() - start, 3)
+            report["finished_at"] = _sqlite_timestamp(datetime.now(timezone.utc))
+            self.last_report = report
+
+        if report["sessions"] or report["pages_released"]:
+            print(f"🧹 Retention: {report['sessions']} sessions / {report['messages']} messages expired, "
+                  f"{report['pages_released']} pages released, "
+                  f"{report['bytes_before']} -> {report['bytes_after']} bytes in {report['duration_s']}s")
+        return report
+
+    def start(self):
+        """Run passes every interval_seconds in a daemon thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    print(f"⚠️  Retention pass failed: {e}")
+                self._stop.wait(self.interval_seconds)
+
+        self._thread = threading.Thread(target=loop, name="retention", daemon=True)
+        self._thread.start()
+        print(f"🧹 Retention enabled: max_age_days={self.max_age_days}, max_db_mb={self.max_db_mb}, "
+              f"archive_dir={self.archive_dir or '-'}, every {self.interval_seconds}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": self._thread is not None and self._thread.is_alive(),
+            "max_age_days": self.max_age_days,
+            "max_db_mb": self.max_db_mb,
+            "archive_dir": self.archive_dir,
+            "last_report": self.last_report,
+        }
+
+
+def _main(argv: List[str]):
+    from app.storage import DATABASE_URL, get_database
+
+    db = get_database()
+    if db is None:
+        print(f"Retention only applies to SQLite databases (DATABASE_URL={DATABASE_URL})")
+        return
+    engine = RetentionEngine(db)
+    if "--enable-incremental-vacuum" in argv:
+        print("Rewriting database with auto_vacuum = INCREMENTAL ...")
+        db.enable_incremental_vacuum()
+    print(engine.run_once(dry_run="--dry-run" in argv))
+
+
+if __name__ == "__main__":
+    import sys
+    _main(sys.argv[1:])
@@ -10,7 +10,6 @@ from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 
 from app.utils.ids import get_session_id_from_request
-from app.database import db
 
 router = APIRouter(prefix="/api/dify", tags=["dify"])
 
@@ -235,10 +234,29 @@ async def dify_recognize(request: Request, body: DifyRecognizeRequest):
 async def dify_health():
     """
     Health check endpoint for Dify integration
+    
+    Answers 503 ("warming") until the startup warmup has finished, so load
+    balancers only route traffic to warm workers.
     """
+    from app.warmup import warmup_state
+    
+    warmup = warmup_state.get_stats()
+    if not warmup["ready"]:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "warming",
+                "service": "GeoGLI-Chatbot-Dify",
+                "version": "1.0.0",
+                "warmup": warmup
+            },
+            headers={"Retry-After": "1"}
+        )
+    
     return {
         "status": "ok",
         "service": "GeoGLI-Chatbot-Dify",
         "version": "1.0.0",
-        "bm25_enabled": RAG_BM25_ENABLED
+        "bm25_enabled": RAG_BM25_ENABLED,
+        "warmup": warmup
     }
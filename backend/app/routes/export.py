@@ -1,132 +1,216 @@
 """
-Export conversation to PDF functionality
+Export conversations (PDF, JSONL, Markdown, CSV, zip archives)
 """
-import os
-import tempfile
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-import textwrap
-from datetime import datetime
-
-from app.database import db
+import itertools
+from typing import Dict, Iterator, List
+
+import anyio
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.storage import get_store
+from app.export_jobs import export_jobs
+from app.utils.pdf import render_conversation_pdf_buffer, iter_buffer_chunks
+from app.utils.exporters import EXPORT_FORMATS, iter_zip_archive
 
 router = APIRouter()
 
+# Chunk size for streaming PDFs
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+# Maximum sessions in one bulk archive
+MAX_ARCHIVE_SESSIONS = 1000
+
+# Messages read from the conversation store per page
+EXPORT_PAGE_MESSAGES = 200
+
+
+def _iter_conversation(session_id: str) -> Iterator[Dict]:
+    """
+    Read a conversation from the DATABASE_URL store a page at a time
+
+    Blocking: only call from worker threads (sync endpoints and the sync
+    iterators StreamingResponse runs in the threadpool), since each page is
+    fetched on the event loop.
+    """
+    store = get_store()
+    after_id = None
+    while True:
+        page = anyio.from_thread.run(
+            lambda: store.get_history(session_id, after_id=after_id, limit=EXPORT_PAGE_MESSAGES)
+        )
+        yield from page["messages"]
+        if not page["has_more"]:
+            return
+        after_id = page["next_after_id"]
+
+
+@router.get("/export")
+def export_archive(
+    session_id: List[str] = Query(..., description="Session identifiers (repeat the parameter)"),
+    format: str = Query("jsonl", description="Per-session file format: jsonl, md or csv")
+):
+    """
+    Export several conversations as one streamed zip archive
+    
+    Args:
+        session_id: Session identifiers
+        format: Format of each session file
+        
+    Returns:
+        Zip stream with one file per session (empty sessions are skipped)
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported archive format: {format}")
+    if len(session_id) > MAX_ARCHIVE_SESSIONS:
+        raise HTTPException(status_code=400, detail=f"Too many sessions (max {MAX_ARCHIVE_SESSIONS})")
+    
+    exporter, _, extension = EXPORT_FORMATS[format]
+    
+    def entries():
+        for sid in dict.fromkeys(session_id):
+            messages = _iter_conversation(sid)
+            first = next(messages, None)
+            if first is None:
+                continue
+            yield f"conversation_{sid}.{extension}", exporter(sid, itertools.chain([first], messages))
+    
+    return StreamingResponse(
+        iter_zip_archive(entries()),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="conversations_{format}.zip"'}
+    )
+
 
 @router.get("/export/{session_id}")
-def export_conversation(session_id: str):
+def export_conversation(
+    session_id: str,
+    format: str = Query("pdf", description="Export format: pdf, jsonl, md or csv")
+):
     """
-    Export conversation to PDF
+    Export conversation as PDF, JSONL, Markdown or CSV
+    
+    Messages are read from the conversation store in pages and streamed, so long
+    conversations do not hold every message in memory at once. PDFs are
+    rendered in memory and laid out a window at a time.
     
     Args:
         session_id: Session identifier
+        format: Export format
         
     Returns:
-        PDF file response
+        File stream
     """
+    if format != "pdf" and format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+    
     try:
-        # Get conversation from database
-        messages = db.get_conversation(session_id)
-        
-        if not messages:
+        # Check the conversation exists (first message only)
+        messages = _iter_conversation(session_id)
+        first = next(messages, None)
+        if first is None:
             raise HTTPException(status_code=404, detail="Conversation not found")
+        messages = itertools.chain([first], messages)
         
-        # Create temporary file
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-        temp_file.close()
-        
-        # Create PDF document
-        doc = SimpleDocTemplate(
-            temp_file.name,
-            pagesize=letter,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=18
-        )
-        
-        # Get styles
-        styles = getSampleStyleSheet()
-        title_style = styles['Title']
-        heading_style = styles['Heading2']
-        normal_style = styles['Normal']
-        
-        # Custom styles
-        user_style = ParagraphStyle(
-            'UserStyle',
-            parent=normal_style,
-            textColor=colors.blue,
-            leftIndent=20,
-            fontName='Helvetica-Bold'
-        )
-        
-        assistant_style = ParagraphStyle(
-            'AssistantStyle', 
-            parent=normal_style,
-            textColor=colors.darkgreen,
-            leftIndent=20
-        )
+        if format != "pdf":
+            exporter, media_type, extension = EXPORT_FORMATS[format]
+            return StreamingResponse(
+                exporter(session_id, messages),
+                media_type=media_type,
+                headers={"Content-Disposition": f'attachment; filename="conversation_{session_id}.{extension}"'}
+            )
         
-        # Build PDF content
-        story = []
+        buffer = render_conversation_pdf_buffer(session_id, messages)
+        size = buffer.getbuffer().nbytes
         
-        # Title
-        story.append(Paragraph("UNCCD GeoGLI Chatbot Conversation", title_style))
-        story.append(Spacer(1, 12))
-        
-        # Session info
-        story.append(Paragraph(f"Session ID: {session_id}", heading_style))
-        story.append(Paragraph(f"Exported: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", normal_style))
-        story.append(Spacer(1, 12))
-        
-        # Messages
-        for message in messages:
-            role = message['role']
-            content = message['content']
-            timestamp = message['created_at']
-            
-            # Role header
-            role_text = f"{role.upper()} ({timestamp})"
-            story.append(Paragraph(role_text, heading_style))
-            
-            # Message content
-            # Wrap long lines and escape HTML
-            content = content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            
-            if role == 'user':
-                story.append(Paragraph(content, user_style))
-            else:
-                story.append(Paragraph(content, assistant_style))
-            
-            story.append(Spacer(1, 12))
-        
-        # Build PDF
-        doc.build(story)
-        
-        # Return file response
-        return FileResponse(
-            temp_file.name,
-            filename=f"conversation_{session_id}.pdf",
+        return StreamingResponse(
+            iter_buffer_chunks(buffer, DOWNLOAD_CHUNK_BYTES),
             media_type="application/pdf",
-            background=_cleanup_temp_file(temp_file.name)
+            headers={
+                "Content-Disposition": f'attachment; filename="conversation_{session_id}.pdf"',
+                "Content-Length": str(size),
+            }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error generating {format.upper()}: {str(e)}")
+
+
+@router.post("/export/{session_id}/jobs", status_code=202)
+def create_export_job(session_id: str):
+    """
+    Enqueue a PDF export in the background
+    
+    Args:
+        session_id: Session identifier
+        
+    Returns:
+        Job status (already "done" when an identical export is cached)
+    """
+    messages = list(_iter_conversation(session_id))
+    if not messages:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    job = export_jobs.submit(session_id, messages)
+    return JSONResponse(
+        status_code=200 if job.status == "done" else 202,
+        content=job.to_dict()
+    )
 
 
-def _cleanup_temp_file(file_path: str):
-    """Background task to cleanup temporary file"""
-    def cleanup():
-        try:
-            os.unlink(file_path)
-        except:
-            pass
-    return cleanup
+@router.get("/export/jobs/{job_id}")
+def get_export_job(job_id: str):
+    """
+    Get export job status
+    
+    Args:
+        job_id: Job identifier
+        
+    Returns:
+        Job status with download_url once done
+    """
+    job = export_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job.to_dict()
+
+
+@router.get("/export/jobs/{job_id}/download")
+def download_export_job(job_id: str):
+    """
+    Stream the PDF of a finished export job
+    
+    Args:
+        job_id: Job identifier
+        
+    Returns:
+        PDF stream
+    """
+    job = export_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Error generating PDF: {job.error}")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Export job is {job.status}")
+    
+    pdf = export_jobs.get_pdf(job)
+    if pdf is None:
+        raise HTTPException(status_code=410, detail="Export expired, please create a new job")
+    
+    def iter_chunks():
+        view = memoryview(pdf)
+        for start in range(0, len(view), DOWNLOAD_CHUNK_BYTES):
+            yield bytes(view[start:start + DOWNLOAD_CHUNK_BYTES])
+    
+    return StreamingResponse(
+        iter_chunks(),
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f'attachment; filename="conversation_{job.session_id}.pdf"',
+            "Content-Length": str(len(pdf)),
+        }
+    )
 
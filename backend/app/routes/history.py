@@ -0,0 +1,42 @@
+"""
+Conversation history endpoints (keyset pagination)
+
+Session ids are the only credential for a conversation, so sessions are not
+listed over HTTP; ConversationStore.list_sessions is for maintenance code.
+"""
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+
+from app.storage import get_store
+
+router = APIRouter(tags=["history"])
+
+# Page size bounds
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+@router.get("/history/{session_id}")
+async def get_history(
+    session_id: str,
+    after_id: Optional[int] = Query(None, ge=0, description="Return messages after this message id"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size")
+):
+    """
+    Get one page of a conversation, oldest first
+
+    Pass next_after_id from the previous page as after_id to continue.
+
+    Args:
+        session_id: Session identifier
+        after_id: Cursor from the previous page
+        limit: Page size
+
+    Returns:
+        Messages with next_after_id and has_more
+    """
+    page = await get_store().get_history(session_id, after_id=after_id, limit=limit)
+    if not page["messages"] and after_id is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return {"session_id": session_id, **page}
+
@@ -0,0 +1,179 @@
+"""
+Offline ranking evaluation for the application's BM25 stores
+Compares plain BM25 and BM25F on each store in STORE_CONFIGS, using the
+store's FIELD_WEIGHTS or candidate weights given on the command line
+
+Judgments come from table rows, which are not indexed: a legislation record's
+description (legislation_details) and ISO2 country code (country_sn). Queries
+therefore do not reuse the indexed title text, and relevance never depends on
+how a title or country name is spelled in the indexed fields.
+
+Usage (from backend/):
+    python -m app.search.bm25_eval [path/to/data_dir]
+    python -m app.search.bm25_eval data geogli 'title=3,text=1,section=2,country=2'
+"""
+import json
+import os
+import sys
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from app.search.bm25_store import BM25Store, FIELD_WEIGHTS, STORE_CONFIGS, find_data_dir
+
+# A judgment is (query, relevance predicate over documents)
+Judgment = Tuple[str, Callable[[Dict[str, Any]], bool]]
+
+
+def _norm(value: Any) -> str:
+    return str(value or "").strip().lower()
+
+
+def _rows(doc: Dict[str, Any]) -> Dict[str, str]:
+    """Key/value table rows of a record (hits and combined formats)"""
+    rows = (doc.get("table") or {}).get("rows") or doc.get("rows") or []
+    return {_norm(row[0]): str(row[1]) for row in rows if isinstance(row, list) and len(row) == 2}
+
+
+def build_judgments(jsonl_path: str, description_words: int = 8) -> List[Judgment]:
+    """
+    Derive judged queries from legislation table rows
+
+    - "<first words of legislation_details> <country>": relevant = the record(s)
+      with that description and country code
+    - "<country> legislation": relevant = all legislation of that country code
+
+    Args:
+        jsonl_path: Store data file (hits or combined format)
+        description_words: Number of description words used for description queries
+
+    Returns:
+        List of (query, is_relevant) judgments
+    """
+    docs = []
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    docs.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+
+    judgments: List[Judgment] = []
+    countries: Dict[str, str] = {}
+    seen = set()
+    for doc in docs:
+        rows = _rows(doc)
+        code = _norm(rows.get("country_sn"))
+        details = _norm(rows.get("legislation_details"))
+        country = _norm(rows.get("country"))
+        if _norm(doc.get("domain")) != "legislation" or not code or not country:
+            continue
+        countries.setdefault(code, country)
+
+        if not details or (code, details) in seen:
+            continue
+        seen.add((code, details))
+        judgments.append((
+            f"{' '.join(details.split()[:description_words])} {country}",
+            lambda d, c=code, t=details: _norm(_rows(d).get("country_sn")) == c
+            and _norm(_rows(d).get("legislation_details")) == t
+        ))
+
+    for code, country in sorted(countries.items()):
+        judgments.append((
+            f"{country} legislation",
+            lambda d, c=code: _norm(d.get("domain")) == "legislation" and _norm(_rows(d).get("country_sn")) == c
+        ))
+
+    return judgments
+
+
+def evaluate(store: BM25Store, judgments: List[Judgment], k: int = 3) -> Dict[str, float]:
+    """
+    Compute precision@k and MRR@k for a store
+
+    Precision is normalized by min(k, number of relevant documents) so
+    queries with a single relevant document can still reach 1.0
+    """
+    precision_sum = 0.0
+    rr_sum = 0.0
+    evaluated = 0
+
+    for query, is_relevant in judgments:
+        total_relevant = sum(1 for d in store.documents if is_relevant(d))
+        if not total_relevant:
+            continue
+
+        results = store.search(query, k=k)
+        flags = [is_relevant(r) for r in results]
+
+        precision_sum += sum(flags) / min(k, total_relevant)
+        rr_sum += next((1.0 / rank for rank, hit in enumerate(flags, 1) if hit), 0.0)
+        evaluated += 1
+
+    if not evaluated:
+        return {"queries": 0, f"p@{k}": 0.0, f"mrr@{k}": 0.0}
+
+    return {
+        "queries": evaluated,
+        f"p@{k}": round(precision_sum / evaluated, 4),
+        f"mrr@{k}": round(rr_sum / evaluated, 4),
+    }
+
+
+def run_eval(
+    data_dir: Optional[str] = None,
+    k: int = 3,
+    weights: Optional[Dict[str, Dict[str, float]]] = None
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Evaluate plain BM25 against BM25F for every application store
+
+    Stores are built exactly as build_all_stores builds them (key fields and
+    FIELD_WEIGHTS), once without and once with field weights.
+
+    Args:
+        data_dir: Data directory (found automatically if omitted)
+        k: Cutoff rank
+        weights: Candidate weights per store (default FIELD_WEIGHTS); stores
+            without weights only get the bm25 row
+
+    Returns:
+        store name -> {"bm25": metrics, "bm25f": metrics}
+    """
+    data_dir = data_dir or find_data_dir()
+    weights = FIELD_WEIGHTS if weights is None else weights
+    report = {}
+    if not data_dir:
+        return report
+
+    for name, filename, key_fields in STORE_CONFIGS:
+        jsonl_path = os.path.join(data_dir, filename)
+        if not os.path.exists(jsonl_path):
+            continue
+        judgments = build_judgments(jsonl_path)
+        bm25 = BM25Store(jsonl_path, key_fields, cache_size=0)
+        report[name] = {"bm25": evaluate(bm25, judgments, k=k)}
+        if weights.get(name):
+            bm25f = BM25Store(jsonl_path, key_fields, field_weights=weights[name], cache_size=0)
+            report[name]["bm25f"] = evaluate(bm25f, judgments, k=k)
+    return report
+
+
+def _parse_weights(spec: str) -> Dict[str, float]:
+    """"title=3,text=1" -> {"title": 3.0, "text": 1.0}"""
+    return {field.strip(): float(value) for field, value in (item.split("=", 1) for item in spec.split(",") if item)}
+
+
+if __name__ == "__main__":
+    candidates = None
+    if len(sys.argv) > 3:
+        candidates = {**FIELD_WEIGHTS, sys.argv[2]: _parse_weights(sys.argv[3])}
+    report = run_eval(sys.argv[1] if len(sys.argv) > 1 else None, weights=candidates)
+    print("=" * 60)
+    print("BM25 vs BM25F ranking evaluation (application stores)")
+    print("=" * 60)
+    for store_name, modes in report.items():
+        print(f"{store_name}:")
+        for mode, metrics in modes.items():
+            print(f"  {mode:>6}: " + ", ".join(f"{name}={value}" for name, value in metrics.items()))
@@ -1,12 +1,42 @@
 """
 BM25 search store for JSONL documents
-Minimal wrapper over rank-bm25 with tokenization for English and Chinese text
+Segmented BM25 / BM25F index with tokenization for English and Chinese text
+Supports incremental add/remove of documents without a full rebuild
 """
 import json
-import re
 import os
-from typing import List, Dict, Any, Optional, Callable
-from rank_bm25 import BM25Okapi
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Callable, Sequence, Set, Union
+
+import numpy as np
+
+from app.search.segments import SegmentedIndex
+from app.search.tokenizer import tokenize, tokenize_query
+
+# BM25F (per-field weighted) scoring for stores configured with field weights
+BM25F_ENABLED = os.getenv("BM25F_ENABLED", "true").lower() == "true"
+
+# Query-result LRU cache entries per store (0 disables caching)
+BM25_CACHE_SIZE = int(os.getenv("BM25_CACHE_SIZE", "1024"))
+
+# Fields with exact-match hash indexes built at load time (also usable as search filters)
+INDEXED_FIELDS = ("region", "country", "iso3", "domain", "section")
+
+# Per-store BM25F field boosts (store name -> field -> weight). Only stores where
+# app.search.bm25_eval shows a gain over plain BM25: on geogli and commit_region
+# every weighting tried (even uniform) ranks below BM25, so they stay plain.
+FIELD_WEIGHTS: Dict[str, Dict[str, float]] = {
+    "commit_country": {"country": 4.0, "text": 1.0, "title": 3.0},
+}
+
+# Application stores: (name, data file, key_fields)
+STORE_CONFIGS = [
+    ("geogli", "combined_tables.jsonl", ["title", "section", "text", "country"]),
+    ("commit_region", "combined_tables_hits.jsonl", ["region", "text", "title"]),
+    ("commit_country", "combined_tables_hits.jsonl", ["country", "text", "title"]),
+]
 
 
 class BM25Store:
@@ -14,7 +44,16 @@ class BM25Store:
     BM25 wrapper for JSONL documents with configurable key fields
     """
     
-    def __init__(self, jsonl_path: str, key_fields: List[str], filter_fn: Optional[Callable] = None):
+    def __init__(
+        self,
+        jsonl_path: str,
+        key_fields: List[str],
+        filter_fn: Optional[Callable] = None,
+        index_fields: Sequence[str] = INDEXED_FIELDS,
+        field_weights: Optional[Dict[str, float]] = None,
+        cache_size: int = BM25_CACHE_SIZE,
+        background_merge: bool = True
+    ):
         """
         Initialize BM25 store from JSONL file
         
@@ -22,33 +61,179 @@ class BM25Store:
             jsonl_path: Path to JSONL file
             key_fields: List of document fields to index for search
             filter_fn: Optional function to filter documents during loading
+            index_fields: Fields to build exact-match hash indexes for
+            field_weights: Optional per-field boosts; enables BM25F scoring
+                           (key fields not listed get weight 1.0)
+            cache_size: Max cached (query tokens, k, filters) results; 0 disables the cache
+            background_merge: Merge index segments in a background thread after updates
         """
         self.jsonl_path = jsonl_path
         self.key_fields = key_fields
         self.filter_fn = filter_fn
-        self.documents = []
-        self.bm25 = None
+        self.index_fields = tuple(index_fields)
+        self.field_weights = (
+            {field: field_weights.get(field, 1.0) for field in key_fields}
+            if field_weights else None
+        )
+        self.background_merge = background_merge
+        
+        # doc_id -> document (ids increase monotonically, so dict order is load order)
+        self._docs: Dict[int, Dict[str, Any]] = {}
+        self._next_id = 0
+        self._documents_view: Optional[List[Dict[str, Any]]] = None
+        self._alive_mask: Optional[np.ndarray] = None
+        self.index = self._new_index()
+        # field -> normalized value -> doc ids
+        self.field_index: Dict[str, Dict[str, List[int]]] = {}
         
-        self._load_documents()
-        self._build_index()
+        # Guards documents/indexes against concurrent updates
+        self._lock = threading.RLock()
+        self._merge_thread: Optional[threading.Thread] = None
+        
+        # (sorted query tokens, k, filters) -> [(doc id, score)]
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, List[tuple]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        self.rebuild()
     
-    def _tokenize(self, text: str) -> List[str]:
+    @property
+    def documents(self) -> List[Dict[str, Any]]:
+        """Live documents in load order"""
+        view = self._documents_view
+        if view is None:
+            view = self._documents_view = list(self._docs.values())
+        return view
+    
+    def _new_index(self) -> SegmentedIndex:
+        return SegmentedIndex(self.key_fields, field_weights=self.field_weights)
+    
+    def rebuild(self):
+        """Reload documents from disk and rebuild all indexes (clears the result cache)"""
+        with self._lock:
+            self._docs = {}
+            self._next_id = 0
+            self.index = self._new_index()
+            self.field_index = {field: {} for field in self.index_fields}
+            self._changed()
+            self.clear_cache()
+            
+            documents = self._load_documents()
+            if not documents:
+                print(f"No documents to index for {self.jsonl_path}")
+                return
+            
+            self._index_documents(documents)
+            mode = f"BM25F index (weights: {self.field_weights})" if self.field_weights else "BM25 index"
+            print(f"Built {mode} for {len(documents)} documents from {self.jsonl_path}")
+    
+    def add_documents(self, documents: Sequence[Dict[str, Any]]) -> List[int]:
         """
-        Tokenize text for BM25 indexing
-        Supports English alphanumeric + Chinese characters
+        Add documents incrementally (indexed as a new segment)
+        
+        Args:
+            documents: Documents to add (filter_fn is applied)
+            
+        Returns:
+            Internal ids of the added documents
         """
-        if not text:
+        if self.filter_fn:
+            documents = [doc for doc in documents if self.filter_fn(doc)]
+        if not documents:
             return []
         
-        # Lowercase and extract tokens: alphanumeric with dots/% + Chinese chars
-        tokens = re.findall(r"[A-Za-z0-9\.%]+|[\u4e00-\u9fa5]+", text.lower())
-        return tokens
+        with self._lock:
+            doc_ids = self._index_documents(documents)
+            self._changed()
+        
+        self._maybe_merge()
+        return doc_ids
+    
+    def remove_documents(self, predicate: Callable[[Dict[str, Any]], bool]) -> int:
+        """
+        Remove documents matching a predicate without rebuilding the index
+        
+        Args:
+            predicate: Function returning True for documents to remove
+            
+        Returns:
+            Number of removed documents
+        """
+        with self._lock:
+            doc_ids = [doc_id for doc_id, doc in self._docs.items() if predicate(doc)]
+            if not doc_ids:
+                return 0
+            
+            self.index.remove_documents(doc_ids)
+            for doc_id in doc_ids:
+                doc = self._docs.pop(doc_id)
+                for field in self.index_fields:
+                    key = self._normalize_value(doc.get(field))
+                    ids = self.field_index[field].get(key)
+                    if ids and doc_id in ids:
+                        ids.remove(doc_id)
+                        if not ids:
+                            del self.field_index[field][key]
+            self._changed()
+        
+        self._maybe_merge()
+        return len(doc_ids)
+    
+    def merge(self):
+        """Merge index segments now (normally done in the background after updates)"""
+        started = time.time()
+        self.index.merge()
+        print(f"Merged BM25 segments for {self.jsonl_path} in {int((time.time() - started) * 1000)} ms")
+    
+    def _maybe_merge(self):
+        """Schedule a segment merge when the index has too many segments or tombstones"""
+        if not self.index.needs_merge():
+            return
+        if not self.background_merge:
+            self.merge()
+            return
+        if self._merge_thread and self._merge_thread.is_alive():
+            return
+        
+        self._merge_thread = threading.Thread(target=self.merge, name="bm25-merge", daemon=True)
+        self._merge_thread.start()
+    
+    def _changed(self):
+        """Invalidate views and cached results after documents change"""
+        self._documents_view = None
+        self._alive_mask = None
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def clear_cache(self):
+        """Drop cached search results and reset hit/miss counters"""
+        with self._cache_lock:
+            self._cache.clear()
+            self.cache_hits = 0
+            self.cache_misses = 0
+    
+    @staticmethod
+    def _normalize_value(value: Any) -> str:
+        """Normalize a field value for exact-match lookup"""
+        if value is None:
+            return ""
+        return str(value).strip().lower()
+    
+    def _tokenize(self, text: str) -> List[str]:
+        """
+        Tokenize text for BM25 indexing
+        Supports English alphanumeric + Chinese character bigrams (see app.search.tokenizer)
+        """
+        return tokenize(text)
     
-    def _load_documents(self):
+    def _load_documents(self) -> List[Dict[str, Any]]:
         """Load documents from JSONL file"""
+        documents: List[Dict[str, Any]] = []
         if not os.path.exists(self.jsonl_path):
             print(f"Warning: JSONL file not found: {self.jsonl_path}")
-            return
+            return documents
         
         try:
             with open(self.jsonl_path, 'r', encoding='utf-8') as f:
@@ -64,99 +249,325 @@ class BM25Store:
                         if self.filter_fn and not self.filter_fn(doc):
                             continue
                         
-                        self.documents.append(doc)
+                        documents.append(doc)
                         
                     except json.JSONDecodeError as e:
                         print(f"Warning: Invalid JSON at line {line_num} in {self.jsonl_path}: {e}")
                         continue
             
-            print(f"Loaded {len(self.documents)} documents from {self.jsonl_path}")
+            print(f"Loaded {len(documents)} documents from {self.jsonl_path}")
             
         except Exception as e:
             print(f"Error loading JSONL file {self.jsonl_path}: {e}")
+        
+        return documents
     
-    def _build_index(self):
-        """Build BM25 index from loaded documents"""
-        if not self.documents:
-            print(f"No documents to index for {self.jsonl_path}")
-            return
+    def _index_documents(self, documents: Sequence[Dict[str, Any]]) -> List[int]:
+        """
+        Assign ids, update exact-match field indexes and add one index segment
+        Field values are normalized once here so lookups avoid per-request lowercasing
+        """
+        doc_ids = []
+        batch = []
+        for doc in documents:
+            doc_id = self._next_id
+            self._next_id += 1
+            self._docs[doc_id] = doc
+            doc_ids.append(doc_id)
+            
+            for field in self.index_fields:
+                key = self._normalize_value(doc.get(field))
+                if key:
+                    self.field_index[field].setdefault(key, []).append(doc_id)
+            
+            batch.append((doc_id, [
+                self._tokenize(str(doc[field])) if doc.get(field) else []
+                for field in self.key_fields
+            ]))
         
-        # Extract and tokenize text from key fields
-        corpus = []
-        for doc in self.documents:
-            # Combine text from all key fields
-            text_parts = []
-            for field in self.key_fields:
-                if field in doc and doc[field]:
-                    text_parts.append(str(doc[field]))
-            
-            combined_text = " ".join(text_parts)
-            tokens = self._tokenize(combined_text)
-            corpus.append(tokens)
-        
-        # Build BM25 index
-        if corpus:
-            self.bm25 = BM25Okapi(corpus)
-            print(f"Built BM25 index for {len(corpus)} documents from {self.jsonl_path}")
-        else:
-            print(f"Warning: No text content found for indexing in {self.jsonl_path}")
+        self.index.add_documents(batch)
+        return doc_ids
     
-    def search(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
+    def lookup(self, field: str, value: str, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Exact-match lookup on an indexed field (case-insensitive)
+        
+        Args:
+            field: Indexed field name (e.g. "region", "country")
+            value: Value to match
+            k: Optional maximum number of documents to return
+            
+        Returns:
+            List of matching documents (copies) in load order
+        """
+        with self._lock:
+            doc_ids = self.field_index.get(field, {}).get(self._normalize_value(value), [])
+            if k is not None:
+                doc_ids = doc_ids[:k]
+            return [self._docs[doc_id].copy() for doc_id in doc_ids]
+    
+    def _alive(self) -> np.ndarray:
+        """Boolean mask over doc ids that are still live"""
+        mask = self._alive_mask
+        if mask is None:
+            mask = np.zeros(self._next_id, dtype=bool)
+            mask[list(self._docs.keys())] = True
+            self._alive_mask = mask
+        return mask
+    
+    def _filter_ids(self, filters: Optional[Dict[str, Any]]) -> Optional[Set[int]]:
+        """
+        Resolve filters to the set of doc ids passing all of them
+        
+        Args:
+            filters: {field: value or list of values}; values within a field are OR-ed,
+                     fields are AND-ed. Fields must be in index_fields.
+                     
+        Returns:
+            Set of doc ids, or None when there is no filter
+        """
+        if not filters:
+            return None
+        
+        allowed: Optional[Set[int]] = None
+        for field, values in filters.items():
+            values_index = self.field_index.get(field)
+            if values_index is None:
+                raise ValueError(f"Cannot filter on '{field}': not one of the indexed fields {self.index_fields}")
+            if isinstance(values, str) or not isinstance(values, (list, tuple, set, frozenset)):
+                values = [values]
+            
+            ids: Set[int] = set()
+            for value in values:
+                ids.update(values_index.get(self._normalize_value(value), ()))
+            allowed = ids if allowed is None else allowed & ids
+            if not allowed:
+                break
+        
+        return allowed
+    
+    @classmethod
+    def _filter_key(cls, filters: Optional[Dict[str, Any]]) -> tuple:
+        """Hashable, order-independent form of filters for cache keys"""
+        if not filters:
+            return ()
+        key = []
+        for field, values in filters.items():
+            if isinstance(values, str) or not isinstance(values, (list, tuple, set, frozenset)):
+                values = [values]
+            key.append((field, tuple(sorted(cls._normalize_value(v) for v in values))))
+        return tuple(sorted(key))
+    
+    def search(self, query: str, k: int = 3, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Search documents using BM25
         
         Args:
             query: Search query string
             k: Number of top results to return
+            filters: Optional {field: value(s)} pre-filter on indexed fields
+                     (e.g. {"country": "china", "domain": "commitment"}); only
+                     documents passing the filter are scored
             
         Returns:
             List of documents with added '_score' field
         """
-        if not self.bm25 or not self.documents:
-            return []
+        return self.search_many([query], k=k, filters=filters)[0]
+    
+    def search_many(
+        self,
+        queries: Sequence[str],
+        k: int = 3,
+        filters: Union[Dict[str, Any], Sequence[Optional[Dict[str, Any]]], None] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search several queries in one scoring pass
         
-        # Tokenize query
-        query_tokens = self._tokenize(query)
-        if not query_tokens:
-            return []
+        All queries are tokenized together; each distinct term is scored once
+        against the corpus and query scores come from a single
+        (queries x terms) @ (terms x documents) product. Rankings are cached
+        per (sorted query tokens, k, filters), so reordered or repeated queries skip scoring.
         
-        # Get BM25 scores
-        scores = self.bm25.get_scores(query_tokens)
+        Args:
+            queries: Search query strings
+            k: Number of top results to return per query
+            filters: Pre-filter shared by all queries (dict), or one filter per query
+                     (list); queries with the same filter are scored together
+            
+        Returns:
+            One result list per query (same shape as search())
+        """
+        if not self._docs:
+            return [[] for _ in queries]
         
-        # Get top-k results
-        top_indices = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+        if filters is None or isinstance(filters, dict):
+            query_filters = [filters] * len(queries)
+        else:
+            query_filters = list(filters)
         
-        results = []
-        for idx in top_indices[:k]:  # Take top k indices
-            if idx < len(self.documents):
-                doc = self.documents[idx].copy()
-                doc["_score"] = float(scores[idx])
-                results.append(doc)
+        # Tokenize queries (cached for repeated queries)
+        query_tokens = [tokenize_query(query) for query in queries]
+        filter_keys = [self._filter_key(f) for f in query_filters]
+        cache_keys = [
+            (tuple(sorted(tokens)), k, filter_key)
+            for tokens, filter_key in zip(query_tokens, filter_keys)
+        ]
+        
+        with self._lock:
+            # Ranked (doc id, score) pairs per query; None = needs scoring
+            ranked: List[Optional[List[tuple]]] = [None] * len(queries)
+            for row, tokens in enumerate(query_tokens):
+                if not tokens:
+                    ranked[row] = []
+                else:
+                    ranked[row] = self._cache_get(cache_keys[row])
+            
+            # Score pending queries, one matrix pass per distinct filter
+            groups: Dict[tuple, List[int]] = {}
+            for row, entry in enumerate(ranked):
+                if entry is None:
+                    groups.setdefault(filter_keys[row], []).append(row)
+            
+            for rows in groups.values():
+                doc_ids = self._filter_ids(query_filters[rows[0]])
+                if doc_ids is not None and not doc_ids:
+                    scored = [[] for _ in rows]
+                else:
+                    scored = self._score_queries([query_tokens[row] for row in rows], k, doc_ids)
+                for row, entry in zip(rows, scored):
+                    ranked[row] = entry
+                    self._cache_put(cache_keys[row], entry)
+            
+            results: List[List[Dict[str, Any]]] = []
+            for entry in ranked:
+                hits = []
+                for doc_id, score in entry:
+                    doc = self._docs[doc_id].copy()
+                    doc["_score"] = score
+                    hits.append(doc)
+                results.append(hits)
         
         return results
     
+    def _score_queries(
+        self,
+        query_tokens: List[List[str]],
+        k: int,
+        doc_ids: Optional[Set[int]] = None
+    ) -> List[List[tuple]]:
+        """
+        Score tokenized queries in one matrix pass
+        
+        Args:
+            query_tokens: Tokenized queries
+            k: Number of results per query
+            doc_ids: Optional pre-filtered doc ids; only these are scored
+            
+        Returns:
+            Top-k (doc id, score) pairs per query
+        """
+        vocab: Dict[str, int] = {}
+        for tokens in query_tokens:
+            for token in tokens:
+                vocab.setdefault(token, len(vocab))
+        
+        # Query-term counts (duplicate query tokens score once per occurrence)
+        query_matrix = np.zeros((len(query_tokens), len(vocab)), dtype=np.float64)
+        for row, tokens in enumerate(query_tokens):
+            for token in tokens:
+                query_matrix[row, vocab[token]] += 1
+        
+        # Columns are all doc ids, or just the filtered ones
+        if doc_ids is None:
+            columns = None
+            width = self._next_id
+        else:
+            columns = np.array(sorted(doc_ids), dtype=np.int64)
+            positions = {doc_id: pos for pos, doc_id in enumerate(columns.tolist())}
+            width = len(columns)
+        
+        term_matrix = np.zeros((len(vocab), width), dtype=np.float64)
+        for term, row in vocab.items():
+            for doc_id, score in self.index.term_scores(term, doc_ids).items():
+                term_matrix[row, doc_id if columns is None else positions[doc_id]] = score
+        
+        score_matrix = query_matrix @ term_matrix
+        if columns is None:
+            # Removed documents can never rank (filtered ids are always live)
+            score_matrix[:, ~self._alive()] = -np.inf
+        
+        ranked = []
+        for scores in score_matrix:
+            # Stable sort keeps load order among equal scores
+            top_indices = np.argsort(-scores, kind="stable")[:k]
+            
+            entry = []
+            for idx in top_indices:
+                score = scores[idx]
+                if score == -np.inf:
+                    break
+                # BM25F only returns documents containing a query term
+                if self.field_weights and score <= 0:
+                    break
+                doc_id = idx if columns is None else columns[idx]
+                entry.append((int(doc_id), float(score)))
+            ranked.append(entry)
+        
+        return ranked
+    
+    def _cache_get(self, key: tuple) -> Optional[List[tuple]]:
+        """Look up a cached ranking and refresh its LRU position"""
+        if self.cache_size <= 0:
+            return None
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self.cache_misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return entry
+    
+    def _cache_put(self, key: tuple, entry: List[tuple]):
+        """Store a ranking, evicting the least recently used entry when full"""
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the store"""
+        lookups = self.cache_hits + self.cache_misses
         return {
             "jsonl_path": self.jsonl_path,
             "key_fields": self.key_fields,
             "document_count": len(self.documents),
-            "indexed": self.bm25 is not None
+            "indexed": self.index.doc_count > 0,
+            "scoring": "bm25f" if self.field_weights else "bm25",
+            "index": self.index.get_stats(),
+            "field_weights": self.field_weights,
+            "cache": {
+                "size": len(self._cache),
+                "max_size": self.cache_size,
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "hit_ratio": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            },
+            "field_index": {field: len(values) for field, values in self.field_index.items()}
         }
 
 
-def build_all_stores() -> Dict[str, BM25Store]:
+def find_data_dir() -> Optional[str]:
     """
-    Build all BM25 stores for the application
+    Locate the data directory
+    Handles different working directory contexts (from project root vs backend dir)
     
     Returns:
-        Dictionary of store name -> BM25Store instance
+        Absolute path, or None if not found
     """
-    stores = {}
-    
-    # Store configurations: (name, jsonl_path, key_fields)
-    # Handle different working directory contexts (from project root vs backend dir)
-    # Try multiple possible locations for data files
     possible_data_dirs = [
         "data",                    # When running from backend/
         "backend/data",            # When running from project root
@@ -164,24 +575,35 @@ def build_all_stores() -> Dict[str, BM25Store]:
         os.path.join(os.path.dirname(__file__), "..", "..", "data")  # Relative to this file
     ]
     
-    data_dir = None
     for dir_path in possible_data_dirs:
         abs_path = os.path.abspath(dir_path)
         if os.path.exists(abs_path) and os.path.isdir(abs_path):
-            data_dir = abs_path
-            print(f"Found data directory: {data_dir}")
-            break
+            print(f"Found data directory: {abs_path}")
+            return abs_path
+    
+    print(f"Warning: Data directory not found. Tried: {possible_data_dirs}")
+    return None
+
+
+def build_all_stores() -> Dict[str, BM25Store]:
+    """
+    Build all BM25 stores for the application
     
+    Returns:
+        Dictionary of store name -> BM25Store instance
+    """
+    stores = {}
+    
+    data_dir = find_data_dir()
     if not data_dir:
-        print(f"Warning: Data directory not found. Tried: {possible_data_dirs}")
         return stores
     
     # Use combined_tables.jsonl for main search
     # Use combined_tables_hits.jsonl for hit-based queries
+    # Field weights apply when BM25F_ENABLED (only stores listed in FIELD_WEIGHTS)
     store_configs = [
-        ("geogli", os.path.join(data_dir, "combined_tables.jsonl"), ["title", "section", "text", "country"]),
-        ("commit_region", os.path.join(data_dir, "combined_tables_hits.jsonl"), ["region", "text", "title"]),
-        ("commit_country", os.path.join(data_dir, "combined_tables_hits.jsonl"), ["country", "text", "title"])
+        (name, os.path.join(data_dir, filename), key_fields)
+        for name, filename, key_fields in STORE_CONFIGS
     ]
     
     for name, jsonl_path, key_fields in store_configs:
@@ -189,8 +611,9 @@ def build_all_stores() -> Dict[str, BM25Store]:
             if not os.path.exists(jsonl_path):
                 print(f"Warning: File not found: {jsonl_path}")
                 continue
-                
-            store = BM25Store(jsonl_path, key_fields)
+            
+            field_weights = FIELD_WEIGHTS.get(name) if BM25F_ENABLED else None
+            store = BM25Store(jsonl_path, key_fields, field_weights=field_weights)
             stores[name] = store
             print(f"✓ Built BM25 store '{name}' with {len(store.documents)} documents")
             
@@ -2,6 +2,7 @@
 Intent handlers for BM25 search
 Maps intents to appropriate BM25 stores and applies filtering logic
 """
+import re
 from typing import List, Dict, Any, Optional
 
 
@@ -69,16 +70,13 @@ def handle_commit_region(query: str, slots: Dict[str, Any], stores: Dict[str, An
     # If specific region is extracted, try exact match first
     region = slots.get("region", "")
     if region:
-        # Filter documents by exact region match
-        exact_matches = []
-        for doc in store.documents:
-            if doc.get("region", "").lower() == region.lower():
-                doc_with_score = doc.copy()
-                doc_with_score["_score"] = 10.0  # High score for exact match
-                exact_matches.append(doc_with_score)
+        # Exact region match via the store's hash index (up to 3 matches)
+        exact_matches = store.lookup("region", region, k=3)
+        for doc in exact_matches:
+            doc["_score"] = 10.0  # High score for exact match
         
         if exact_matches:
-            return exact_matches[:3]  # Return up to 3 exact matches
+            return exact_matches
     
     # Fall back to BM25 search
     search_query = query
@@ -109,16 +107,19 @@ def handle_commit_country(query: str, slots: Dict[str, Any], stores: Dict[str, A
     # If specific country is extracted, try exact match first
     country = slots.get("country", "")
     if country:
-        # Filter documents by exact country match
-        exact_matches = []
-        for doc in store.documents:
-            if doc.get("country", "").lower() == country.lower():
-                doc_with_score = doc.copy()
-                doc_with_score["_score"] = 10.0  # High score for exact match
-                exact_matches.append(doc_with_score)
+        # Exact country match via the store's hash index (up to 3 matches)
+        exact_matches = store.lookup("country", country, k=3)
+        if not exact_matches:
+            # Documents keyed by ISO3 code (e.g. "SAU") instead of name
+            from app.engine.targets import to_iso3
+            iso3 = to_iso3(country.strip().lower())
+            if iso3:
+                exact_matches = store.lookup("iso3", iso3, k=3)
+        for doc in exact_matches:
+            doc["_score"] = 10.0  # High score for exact match
         
         if exact_matches:
-            return exact_matches[:3]  # Return up to 3 exact matches
+            return exact_matches
     
     # Fall back to BM25 search
     search_query = query
@@ -258,6 +259,93 @@ def _test_handlers():
 
 # --- New lightweight entry points for pipeline.py ---
 
+def _country_spellings(target: str) -> set[str]:
+    """
+    Known spellings of a country: the target, its canonical name, aliases and ISO3 code
+    
+    Args:
+        target: Country name or alias (e.g. "ksa", "saudi arabia")
+        
+    Returns:
+        Lowercase spellings (e.g. {"saudi arabia", "ksa", "kingdom of saudi arabia", "sau", ...})
+    """
+    from app.engine.targets import COUNTRY_ALIASES, to_iso3
+    
+    name = " ".join(target.strip().lower().split())
+    canonical = name if name in COUNTRY_ALIASES else next(
+        (country for country, aliases in COUNTRY_ALIASES.items() if name in aliases), name
+    )
+    spellings = {name, canonical} | COUNTRY_ALIASES.get(canonical, set())
+    iso = to_iso3(canonical)
+    if iso:
+        spellings.add(iso.lower())
+    return spellings
+
+
+def _target_filters(store, target: str) -> dict | None:
+    """
+    Build a BM25 pre-filter restricting results to the routing target
+    
+    Region self-keys ("asia-asia") filter on "region", countries on "country".
+    A country matches every known spelling (aliases, ISO3 code) and indexed
+    values containing one of them as whole words, so "united states" keeps the
+    "USA" and "United States of America" documents.
+    Returns None for the world-world fallback, when the store's documents do
+    not carry the field, or when no document matches (callers then search
+    unfiltered, with the target in the query text).
+    
+    Args:
+        store: BM25Store instance
+        target: Country name or region self-key
+        
+    Returns:
+        Filters dict for BM25Store.search, or None
+    """
+    if not target or target == "world-world":
+        return None
+    
+    if "-" in target:
+        field, values = "region", [target, target.split("-", 1)[0]]
+        values_index = store.field_index.get(field)
+        if not values_index:
+            return None
+        values = [value for value in values if value.strip().lower() in values_index]
+    else:
+        field = "country"
+        values_index = store.field_index.get(field)
+        if not values_index:
+            return None
+        spellings = _country_spellings(target)
+        # Whole-word containment for long forms; short aliases ("us", "cn") must match exactly
+        long_forms = re.compile(
+            r"\b(?:" + "|".join(re.escape(s) for s in sorted(spellings) if len(s) >= 4) + r")\b"
+        ) if any(len(s) >= 4 for s in spellings) else None
+        values = sorted(
+            value for value in values_index
+            if value in spellings or (long_forms is not None and long_forms.search(value))
+        )
+    
+    if not values:
+        return None
+    return {field: values}
+
+
+def _target_query(target: str, filters: dict | None) -> str:
+    """
+    Query text for a filtered target search
+    
+    Adds the filter's spellings that share no token with the target, so
+    documents labelled "USA" still score for "united states" while long
+    forms ("people's republic of china") do not outweigh the short name.
+    """
+    from app.search.tokenizer import tokenize
+    
+    target_tokens = set(tokenize(target))
+    values = [value for field_values in (filters or {}).values() for value in field_values]
+    extra = [value for value in values if not target_tokens & set(tokenize(value))]
+    return " ".join([target, *extra])
+
+
 def search_country_profile(target: str, section_hint: str | None = None) -> list[dict]:
     """
     Search country profile data using BM25
@@ -277,22 +365,24 @@ def search_country_profile(target: str, section_hint: str | None = None) -> list
     
     store = stores["geogli"]
     
-    # Build search query
-    query_parts = [target]
+    # Restrict scoring to the target's documents; the target name is only
+    # needed in the query text when the store cannot filter on it
+    filters = _target_filters(store, target)
+    query_parts = [] if filters else [target]
     
     # Add section hint if provided (convert "stressors/fires" to "stressors fires")
     if section_hint:
         section_parts = section_hint.replace("/", " ")
         query_parts.append(section_parts)
     
-    query = " ".join(query_parts)
+    query = " ".join(query_parts) or _target_query(target, filters)
     
     # Search with BM25
-    results = store.search(query, k=5)
+    results = store.search(query, k=5, filters=filters)
     
     # If section hint provided but no results, try without hint
     if section_hint and not results:
-        results = store.search(target, k=5)
+        results = store.search(_target_query(target, filters), k=5, filters=filters)
     
     return results
 
@@ -327,8 +417,89 @@ def search_commitment(target: str) -> list[dict]:
             return []
         store = stores["commit_country"]
     
-    # Search with BM25
-    results = store.search(target, k=3)
+    # Search with BM25, restricted to the target's documents when possible
+    filters = _target_filters(store, target)
+    results = store.search(_target_query(target, filters), k=3, filters=filters)
+    return results
+
+
+def search_country_profile_many(targets: list[str], section_hint: str | None = None) -> list[list[dict]]:
+    """
+    Batch version of search_country_profile for multi-target queries
+    
+    Args:
+        targets: Country names or region self-keys
+        section_hint: Optional section hint shared by all targets
+        
+    Returns:
+        One result list per target (same order as targets)
+    """
+    from app.main import app as app_ref
+    
+    stores = getattr(app_ref.state, "bm25_stores", None)
+    if not stores or "geogli" not in stores:
+        return [[] for _ in targets]
+    
+    store = stores["geogli"]
+    
+    section_parts = section_hint.replace("/", " ") if section_hint else ""
+    filters = [_target_filters(store, target) for target in targets]
+    queries = [
+        (section_parts if target_filters else f"{target} {section_parts}").strip()
+        or _target_query(target, target_filters)
+        for target, target_filters in zip(targets, filters)
+    ]
+    results = store.search_many(queries, k=5, filters=filters)
+    
+    # If section hint provided but no results, retry those targets without hint
+    if section_hint:
+        empty = [i for i, hits in enumerate(results) if not hits]
+        if empty:
+            retried = store.search_many(
+                [_target_query(targets[i], filters[i]) for i in empty], k=5, filters=[filters[i] for i in empty]
+            )
+            for i, hits in zip(empty, retried):
+                results[i] = hits
+    
+    return results
+
+
+def search_commitment_many(targets: list[str]) -> list[list[dict]]:
+    """
+    Batch version of search_commitment for multi-target queries
+    Targets are grouped per store (region vs country) and searched in one pass each
+    
+    Args:
+        targets: Country names or region self-keys
+        
+    Returns:
+        One result list per target (same order as targets)
+    """
+    from app.main import app as app_ref
+    
+    results: list[list[dict]] = [[] for _ in targets]
+    stores = getattr(app_ref.state, "bm25_stores", None)
+    if not stores:
+        return results
+    
+    groups: dict[str, list[int]] = {}
+    for i, target in enumerate(targets):
+        store_name = "commit_region" if "-" in target else "commit_country"
+        groups.setdefault(store_name, []).append(i)
+    
+    for store_name, indices in groups.items():
+        if store_name not in stores:
+            continue
+        store = stores[store_name]
+        filters = [_target_filters(store, targets[i]) for i in indices]
+        batch = store.search_many(
+            [_target_query(targets[i], target_filters) for i, target_filters in zip(indices, filters)],
+            k=3,
+            filters=filters
+        )
+        for i, hits in zip(indices, batch):
+            results[i] = hits
+    
     return results
 
 
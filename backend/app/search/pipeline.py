@@ -7,8 +7,8 @@ from typing import List, Dict, Any
 
 from app.search.router_intent import route_query  # Rule-based router (no ML)
 from app.search.handlers import (
-    search_country_profile,
-    search_commitment,
+    search_country_profile_many,
+    search_commitment_many,
     search_legislation,
 )
 
@@ -45,15 +45,15 @@ def process_query(user_query: str) -> QueryResult:
     # Aggregate hits from all targets
     all_hits: List[Dict[str, Any]] = []
     
-    for target in targets:
-        # Route to appropriate handler based on domain
-        if decision.domain == "commitment":
-            hits = search_commitment(target=target)
-        elif decision.domain == "legislation":
-            hits = search_legislation(target=target)
-        else:  # country_profile (default)
-            hits = search_country_profile(target=target, section_hint=decision.section_hint)
-        
+    # Route to appropriate handler based on domain; BM25 domains search all targets in one pass
+    if decision.domain == "commitment":
+        hits_per_target = search_commitment_many(targets)
+    elif decision.domain == "legislation":
+        hits_per_target = [search_legislation(target=target) for target in targets]
+    else:  # country_profile (default)
+        hits_per_target = search_country_profile_many(targets, section_hint=decision.section_hint)
+    
+    for target, hits in zip(targets, hits_per_target):
         # Attach routing target to each hit for frontend display/grouping
         for h in hits:
             h.setdefault("country", target)
@@ -0,0 +1,299 @@
+"""
+Segmented inverted index for BM25 / BM25F scoring
+Documents are indexed in batches (segments); corpus statistics are maintained
+incrementally so adding or removing documents never requires a full rebuild
+"""
+import math
+import threading
+from typing import List, Dict, Iterable, Optional, Sequence, Set, Tuple
+
+# A document to index: (doc_id, tokens per field in index field order)
+IndexedDoc = Tuple[int, List[List[str]]]
+
+
+class Segment:
+    """
+    Batch of indexed documents with its own postings
+    Segments are never modified after creation; deletions are tombstones on the index
+    """
+
+    def __init__(self, num_fields: int, docs: Iterable[IndexedDoc] = ()):
+        self.num_fields = num_fields
+        # term -> {doc_id: [tf per field]}
+        self.postings: Dict[str, Dict[int, List[int]]] = {}
+        # doc_id -> [length per field]
+        self.field_lengths: Dict[int, List[int]] = {}
+        # doc_id -> distinct terms (to update document frequencies on delete)
+        self.doc_terms: Dict[int, List[str]] = {}
+
+        for doc_id, field_tokens in docs:
+            self._add(doc_id, field_tokens)
+
+    def _add(self, doc_id: int, field_tokens: List[List[str]]):
+        lengths = []
+        for f_idx, tokens in enumerate(field_tokens):
+            lengths.append(len(tokens))
+            for token in tokens:
+                tfs = self.postings.setdefault(token, {}).setdefault(doc_id, [0] * self.num_fields)
+                tfs[f_idx] += 1
+        self.field_lengths[doc_id] = lengths
+        self.doc_terms[doc_id] = list({token for tokens in field_tokens for token in tokens})
+
+    def __len__(self) -> int:
+        return len(self.field_lengths)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self.field_lengths
+
+    @classmethod
+    def merge(cls, segments: Sequence["Segment"], deleted: Set[int], num_fields: int) -> "Segment":
+        """Combine segments into one, dropping deleted documents"""
+        merged = cls(num_fields)
+        for segment in segments:
+            for term, docs in segment.postings.items():
+                target = None
+                for doc_id, tfs in docs.items():
+                    if doc_id in deleted:
+                        continue
+                    if target is None:
+                        target = merged.postings.setdefault(term, {})
+                    target[doc_id] = tfs
+            for doc_id, lengths in segment.field_lengths.items():
+                if doc_id not in deleted:
+                    merged.field_lengths[doc_id] = lengths
+                    merged.doc_terms[doc_id] = segment.doc_terms[doc_id]
+        return merged
+
+
+class SegmentedIndex:
+    """
+    BM25 (Okapi) or BM25F index over segments
+
+    - field_weights=None: Okapi BM25 over all fields combined (rank-bm25 compatible idf)
+    - field_weights given: BM25F with per-field length normalization and boosts
+    """
+
+    def __init__(
+        self,
+        fields: Sequence[str],
+        field_weights: Optional[Dict[str, float]] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+        max_segments: int = 8,
+        max_deleted_ratio: float = 0.2
+    ):
+        """
+        Args:
+            fields: Field names, in the order field tokens are passed
+            field_weights: Optional per-field boosts (enables BM25F)
+            k1: Term frequency saturation
+            b: Length normalization strength
+            epsilon: Okapi floor for negative idf (fraction of average idf)
+            max_segments: Segment count above which a merge is due
+            max_deleted_ratio: Tombstone ratio above which a merge is due
+        """
+        self.fields = list(fields)
+        self.weights = [float(field_weights.get(f, 1.0)) for f in self.fields] if field_weights else None
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.max_segments = max_segments
+        self.max_deleted_ratio = max_deleted_ratio
+
+        # Segment list and tombstone set are replaced (never mutated in place) so
+        # readers can snapshot them: readers take deleted before segments, merge
+        # publishes segments before deleted, so a purged tombstone is never missing
+        # while its document is still in a segment the reader walks
+        self.segments: List[Segment] = []
+        self.deleted: Set[int] = set()
+
+        # Corpus statistics over live documents
+        self.doc_count = 0
+        self.doc_freqs: Dict[str, int] = {}
+        self.total_lengths = [0] * len(self.fields)
+
+        self._okapi_idf: Optional[Dict[str, float]] = None  # recomputed lazily after changes
+        self._lock = threading.RLock()
+
+    @property
+    def is_bm25f(self) -> bool:
+        return self.weights is not None
+
+    def add_documents(self, docs: Sequence[IndexedDoc]):
+        """Index a batch of documents as a new segment and update corpus statistics"""
+        if not docs:
+            return
+        segment = Segment(len(self.fields), docs)
+
+        with self._lock:
+            for doc_id, lengths in segment.field_lengths.items():
+                for f_idx, length in enumerate(lengths):
+                    self.total_lengths[f_idx] += length
+                for term in segment.doc_terms[doc_id]:
+                    self.doc_freqs[term] = self.doc_freqs.get(term, 0) + 1
+            self.doc_count += len(segment)
+            self.segments = self.segments + [segment]
+            self._okapi_idf = None
+
+    def remove_documents(self, doc_ids: Iterable[int]) -> int:
+        """
+        Tombstone documents and subtract them from corpus statistics
+
+        Returns:
+            Number of live documents removed
+        """
+        removed = 0
+        with self._lock:
+            deleted = set(self.deleted)
+            for doc_id in doc_ids:
+                if doc_id in deleted:
+                    continue
+                segment = next((s for s in self.segments if doc_id in s), None)
+                if segment is None:
+                    continue
+
+                for f_idx, length in enumerate(segment.field_lengths[doc_id]):
+                    self.total_lengths[f_idx] -= length
+                for term in segment.doc_terms[doc_id]:
+                    remaining = self.doc_freqs.get(term, 0) - 1
+                    if remaining > 0:
+                        self.doc_freqs[term] = remaining
+                    else:
+                        self.doc_freqs.pop(term, None)
+
+                deleted.add(doc_id)
+                self.doc_count -= 1
+                removed += 1
+
+            if removed:
+                self.deleted = deleted
+                self._okapi_idf = None
+        return removed
+
+    def needs_merge(self) -> bool:
+        """True when there are too many segments or too many tombstones"""
+        segments = self.segments
+        if len(segments) > self.max_segments:
+            return True
+        total = sum(len(s) for s in segments)
+        return bool(total) and len(self.deleted) / total > self.max_deleted_ratio
+
+    def merge(self):
+        """Merge all current segments into one and purge their tombstones"""
+        with self._lock:
+            snapshot = self.segments
+            deleted = set(self.deleted)
+        if len(snapshot) <= 1 and not deleted:
+            return
+
+        merged = Segment.merge(snapshot, deleted, len(self.fields))
+        purged = {doc_id for s in snapshot for doc_id in s.field_lengths if doc_id in deleted}
+
+        with self._lock:
+            # Keep segments added while merging
+            merged_ids = {id(s) for s in snapshot}
+            self.segments = [merged] + [s for s in self.segments if id(s) not in merged_ids]
+            self.deleted = self.deleted - purged
+
+    def _okapi_idfs(self) -> Dict[str, float]:
+        """rank-bm25 Okapi idf: negative values replaced by epsilon * average idf"""
+        idfs = self._okapi_idf
+        if idfs is not None:
+            return idfs
+
+        with self._lock:
+            idfs = {}
+            idf_sum = 0.0
+            negative = []
+            for term, df in self.doc_freqs.items():
+                idf = math.log(self.doc_count - df + 0.5) - math.log(df + 0.5)
+                idfs[term] = idf
+                idf_sum += idf
+                if idf < 0:
+                    negative.append(term)
+            if idfs:
+                eps = self.epsilon * idf_sum / len(idfs)
+                for term in negative:
+                    idfs[term] = eps
+            self._okapi_idf = idfs
+        return idfs
+
+    def term_scores(self, term: str, doc_ids: Optional[Set[int]] = None) -> Dict[int, float]:
+        """
+        Score contribution of a single term
+
+        Args:
+            term: Query token
+            doc_ids: Optional set of doc ids to restrict scoring to (pre-filter)
+
+        Returns:
+            Dict of doc_id -> score for live documents containing the term
+        """
+        if term not in self.doc_freqs:
+            return {}
+        if self.is_bm25f:
+            return self._bm25f_term_scores(term, doc_ids)
+        return self._okapi_term_scores(term, doc_ids)
+
+    def _postings_for(self, term: str, doc_ids: Optional[Set[int]]):
+        """Yield (segment, doc_id, tfs) for live postings of a term, optionally restricted to doc_ids"""
+        deleted = self.deleted
+        for segment in self.segments:
+            docs = segment.postings.get(term)
+            if not docs:
+                continue
+            if doc_ids is None:
+                items = docs.items()
+            elif len(doc_ids) < len(docs):
+                # Walk the smaller side: the filter set
+                items = ((doc_id, docs[doc_id]) for doc_id in doc_ids if doc_id in docs)
+            else:
+                items = ((doc_id, tfs) for doc_id, tfs in docs.items() if doc_id in doc_ids)
+            for doc_id, tfs in items:
+                if doc_id not in deleted:
+                    yield segment, doc_id, tfs
+
+    def _okapi_term_scores(self, term: str, doc_ids: Optional[Set[int]]) -> Dict[int, float]:
+        idf = self._okapi_idfs().get(term)
+        if not idf:
+            return {}
+
+        avgdl = (sum(self.total_lengths) / self.doc_count) if self.doc_count else 1.0
+        k1, b = self.k1, self.b
+
+        scores: Dict[int, float] = {}
+        for segment, doc_id, tfs in self._postings_for(term, doc_ids):
+            tf = sum(tfs)
+            doc_len = sum(segment.field_lengths[doc_id])
+            scores[doc_id] = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * doc_len / avgdl))
+        return scores
+
+    def _bm25f_term_scores(self, term: str, doc_ids: Optional[Set[int]]) -> Dict[int, float]:
+        df = self.doc_freqs[term]
+        idf = math.log(1.0 + (self.doc_count - df + 0.5) / (df + 0.5))
+        avg_lengths = [
+            (total / self.doc_count) if self.doc_count and total else 1.0 for total in self.total_lengths
+        ]
+        k1, b = self.k1, self.b
+
+        scores: Dict[int, float] = {}
+        for segment, doc_id, tfs in self._postings_for(term, doc_ids):
+            lengths = segment.field_lengths[doc_id]
+            weighted_tf = 0.0
+            for f_idx, tf in enumerate(tfs):
+                if tf:
+                    norm = 1.0 - b + b * lengths[f_idx] / avg_lengths[f_idx]
+                    weighted_tf += self.weights[f_idx] * tf / norm
+            scores[doc_id] = idf * weighted_tf / (k1 + weighted_tf)
+        return scores
+
+    def get_stats(self) -> Dict[str, int]:
+        """Segment and tombstone counts"""
+        segments = self.segments
+        return {
+            "segments": len(segments),
+            "segment_docs": sum(len(s) for s in segments),
+            "deleted": len(self.deleted),
+            "terms": len(self.doc_freqs),
+        }
@@ -0,0 +1,131 @@
+"""
+Tokenizer for BM25 indexing and queries
+Single-pass Latin normalization + CJK character bigrams, with a cache for repeated queries
+
+Usage (benchmark, from backend/):
+    python -m app.search.tokenizer [path/to/file.jsonl]
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Tuple
+
+# Latin alphanumerics (with dots/% for numbers like "2.5" / "30%", accented letters folded
+# later) or runs of CJK ideographs
+_TOKEN_RE = re.compile(r"[a-z0-9.%\u00c0-\u024f]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+# Same tokens for pure-ASCII text, without the Unicode alternatives
+_ASCII_TOKEN_RE = re.compile(r"[a-z0-9.%]+")
+# Latin-only tokens, for non-ASCII text without CJK characters
+_LATIN_TOKEN_RE = re.compile(r"[a-z0-9.%\u00c0-\u024f]+")
+_CJK_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+# Any character _TOKEN_RE keeps beyond ASCII (other scripts, e.g. Cyrillic, are dropped)
+_NON_ASCII_TOKEN_CHAR_RE = re.compile(r"[\u00c0-\u024f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+# Combining diacritical marks left over after NFKD decomposition
+_COMBINING_RE = re.compile(r"[\u0300-\u036f]+")
+
+QUERY_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _fold(token: str) -> str:
+    """Fold accents in a Latin token (e.g. "côte" -> "cote")"""
+    return _COMBINING_RE.sub("", unicodedata.normalize("NFKD", token))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokenize text for BM25
+
+    Latin runs become lowercase, accent-folded tokens; each run of Chinese
+    characters is emitted as overlapping character bigrams (a single
+    character stays a unigram), so "土地退化问题" matches a query for "土地"
+
+    Args:
+        text: Raw document or query text
+
+    Returns:
+        List of tokens
+    """
+    if not text:
+        return []
+
+    text = text.lower()
+    if text.isascii() or not _NON_ASCII_TOKEN_CHAR_RE.search(text):
+        # Fast path: no accents to fold, no CJK runs to split
+        return _ASCII_TOKEN_RE.findall(text)
+
+    if not _CJK_RE.search(text):
+        # Accented Latin text: only tokens with accents need folding
+        return [token if token.isascii() else _fold(token) for token in _LATIN_TOKEN_RE.findall(text)]
+
+    tokens = _TOKEN_RE.findall(text)
+    out: List[str] = []
+    for token in tokens:
+        if token.isascii():
+            out.append(token)
+        elif token[0] >= "\u3400":
+            # CJK run -> overlapping bigrams
+            if len(token) > 2:
+                out.extend(token[i:i + 2] for i in range(len(token) - 1))
+            else:
+                out.append(token)
+        else:
+            out.append(_fold(token))
+    return out
+
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _tokenize_query_cached(query: str) -> Tuple[str, ...]:
+    return tuple(tokenize(query))
+
+
+def tokenize_query(query: str) -> List[str]:
+    """Tokenize a query string, caching results for repeated queries"""
+    return list(_tokenize_query_cached(query))
+
+
+def query_cache_info() -> dict:
+    """Hit/miss statistics of the query token cache"""
+    info = _tokenize_query_cached.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
+
+
+# --- Benchmark ---
+def _bench_tokenizer(jsonl_path: str = "data/combined_tables_hits.jsonl", repeat: int = 20):
+    """Compare indexing throughput with the legacy per-call regex tokenizer"""
+    import time
+
+    def legacy_tokenize(text: str) -> List[str]:
+        return re.findall(r"[A-Za-z0-9\.%]+|[\u4e00-\u9fa5]+", text.lower())
+
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    total_bytes = sum(len(line.encode("utf-8")) for line in lines)
+
+    print("=" * 60)
+    print(f"Tokenizer throughput: {len(lines)} docs, best of {repeat} passes, from {jsonl_path}")
+    print("=" * 60)
+
+    # Best of `repeat` passes (single passes are too noisy to compare)
+    for name, fn in (("legacy", legacy_tokenize), ("tokenizer", tokenize)):
+        best = float("inf")
+        token_count = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            token_count = sum(len(fn(line)) for line in lines)
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:>10}: {len(lines) / best:10.0f} docs/s, "
+              f"{total_bytes / best / 1e6:6.1f} MB/s, {token_count} tokens/pass")
+
+    # Repeated queries hit the cache
+    queries = ["saudi arabia stressors fires", "china commitment", "土地退化"] * 1000
+    start = time.perf_counter()
+    for q in queries:
+        tokenize_query(q)
+    elapsed = time.perf_counter() - start
+    print(f"{'queries':>10}: {len(queries) / elapsed:10.0f} q/s (cache: {query_cache_info()})")
+
+
+if __name__ == "__main__":
+    import sys
+    _bench_tokenizer(*sys.argv[1:2])
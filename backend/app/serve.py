@@ -0,0 +1,200 @@
+"""
+Multi-worker launcher with pre-fork loading (copy-on-write sharing)
+
+Usage (from backend/):
+    python -m app.serve [--workers N] [--host HOST] [--port PORT] [--memory-report]
+
+WEB_CONCURRENCY sets the default worker count (1 = plain uvicorn, as before).
+With N > 1 the master process:
+1. imports app.main and loads read-only data (schema check, mmap'd source
+   snapshots) - see app.warmup.preload_shared
+2. moves everything loaded so far out of the garbage collector's reach
+   (gc.freeze), so collections in workers do not write to shared pages
+3. binds the listening socket and forks N uvicorn workers that accept on it
+
+Workers therefore start without re-importing or re-indexing, and the imported
+modules and snapshots stay shared between them until written to. The master
+restarts workers that die; SIGTERM/SIGINT stop all of them; SIGUSR1 prints a
+per-worker memory report (also printed once after startup with --memory-report).
+
+Needs os.fork (Linux/macOS); elsewhere a single worker is run.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+
+# Seconds after startup before the --memory-report snapshot (lets workers warm up)
+MEMORY_REPORT_DELAY = 5.0
+
+# Minimum seconds between restarts of crashing workers
+RESTART_BACKOFF = 1.0
+
+
+def preload():
+    """Import the app and load shared read-only data in the master"""
+    from app.main import app
+    from app.warmup import preload_shared
+
+    start = time.perf_counter()
+    stats = preload_shared()
+    gc.collect()
+    gc.freeze()
+    print(f"📦 Preloaded in {(time.perf_counter() - start) * 1000:.0f} ms before fork: {stats}")
+    return app
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, worker_id: int):
+    """Worker process body (never returns)"""
+    import uvicorn
+
+    # Default signal handling for uvicorn's own handlers
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+        signal.signal(sig, signal.SIG_DFL)
+    # Lets the app run once-per-deployment tasks (e.g. retention) in worker 0 only
+    os.environ["APP_WORKER_ID"] = str(worker_id)
+
+    exit_code = 0
+    try:
+        uvicorn.Server(uvicorn.Config(app, lifespan="on")).run(sockets=[sock])
+    except BaseException as e:
+        print(f"⚠️  Worker {worker_id} crashed: {e}")
+        exit_code = 1
+    finally:
+        sys.stdout.flush()
+        os._exit(exit_code)
+
+
+def memory_report(workers: Dict[int, int]) -> List[Dict]:
+    """
+    Memory of the master and each worker, with totals
+
+    Args:
+        workers: pid -> worker id
+
+    Returns:
+        One row per process (process_memory fields plus pid and role)
+    """
+    from app.utils.memory import process_memory
+
+    rows = [{"role": "master", "pid": os.getpid(), **(process_memory() or {})}]
+    for pid, worker_id in sorted(workers.items(), key=lambda kv: kv[1]):
+        rows.append({"role": f"worker {worker_id}", "pid": pid, **(process_memory(pid) or {})})
+    return rows
+
+
+def print_memory_report(workers: Dict[int, int]):
+    rows = memory_report(workers)
+    fields = ["rss_mb", "pss_mb", "shared_clean_mb", "shared_dirty_mb", "private_dirty_mb"]
+    if not all(field in rows[0] for field in fields):
+        print(f"📊 Memory: {rows}")
+        return
+    print("📊 Memory (MB)   " + "".join(f"{f[:-3]:>15}" for f in fields))
+    for row in rows:
+        print(f"   {row['role']:<13}" + "".join(f"{row[f]:>15.1f}" for f in fields))
+    worker_rows = rows[1:]
+    rss = sum(r["rss_mb"] for r in worker_rows)
+    pss = sum(r["pss_mb"] for r in rows)
+    print(f"   workers RSS sum {rss:.1f} MB (no sharing) vs PSS sum incl. master {pss:.1f} MB (actual)")
+
+
+def serve(workers: int, host: str, port: int, report: bool = False):
+    """Run the app with the given number of workers (blocks until stopped)"""
+    if workers <= 1 or not hasattr(os, "fork"):
+        import uvicorn
+        uvicorn.run("app.main:app", host=host, port=port)
+        return
+
+    app = preload()
+    sock = _bind(host, port)
+    children: Dict[int, int] = {}
+    stopping = False
+    report_requested = False
+
+    def spawn(worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(app, sock, worker_id)
+        children[pid] = worker_id
+
+    def on_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    def on_report(signum, frame):
+        nonlocal report_requested
+        report_requested = True
+
+    signal.signal(signal.SIGTERM, on_stop)
+    signal.signal(signal.SIGINT, on_stop)
+    signal.signal(signal.SIGUSR1, on_report)
+
+    for worker_id in range(workers):
+        spawn(worker_id)
+    print(f"🚀 Serving on http://{host}:{port} with {workers} workers (pids {sorted(children)})")
+
+    started = time.monotonic()
+    last_restart = 0.0
+    report_due = report
+    while not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid, status = 0, 0
+        if pid and pid in children:
+            worker_id = children.pop(pid)
+            if not stopping:
+                print(f"⚠️  Worker {worker_id} (pid {pid}) exited with status {status}; restarting")
+                time.sleep(max(0.0, RESTART_BACKOFF - (time.monotonic() - last_restart)))
+                last_restart = time.monotonic()
+                spawn(worker_id)
+        if report_requested or (report_due and time.monotonic() - started >= MEMORY_REPORT_DELAY):
+            report_requested = report_due = False
+            print_memory_report(children)
+        time.sleep(0.2)
+
+    print("🛑 Stopping workers...")
+    for pid in list(children):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in list(children):
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    sock.close()
+
+
+def _main(argv: List[str]):
+    parser = argparse.ArgumentParser(description="Run the chatbot API with pre-forked workers")
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--memory-report", action="store_true",
+                        help=f"Print per-worker memory {MEMORY_REPORT_DELAY:.0f}s after startup")
+    args = parser.parse_args(argv)
+    serve(args.workers, args.host, args.port, report=args.memory_report)
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1:])
@@ -2,7 +2,12 @@
 Base class for data sources (plugin architecture)
 No intent recognition - sources declare if they match a query
 """
-from typing import List, Dict
+import threading
+from typing import List, Dict, Optional
+
+
+class FetchStopped(Exception):
+    """Raised by Source.fetch when its stop flag is set (the client has gone away)"""
 
 
 class Source:
@@ -24,15 +29,37 @@ class Source:
         """
         raise NotImplementedError
     
-    def fetch(self, query: str, targets: List[str]) -> List[Dict]:
+    def fetch(self, query: str, targets: List[str], stop: Optional[threading.Event] = None) -> List[Dict]:
         """
         Fetch results for the given query and targets
         
+        Runs in a worker thread for async callers. Long fetches should call
+        check_stop(stop) between steps so abandoned requests stop using CPU.
+        
         Args:
             query: User query string
             targets: List of target keys (countries or region self-keys)
+            stop: Optional flag set when the result is no longer wanted
             
         Returns:
             List of result dictionaries
+            
+        Raises:
+            FetchStopped: If stop was set (via check_stop)
         """
         raise NotImplementedError
+    
+    @staticmethod
+    def check_stop(stop: Optional[threading.Event]):
+        """Raise FetchStopped if the stop flag is set"""
+        if stop is not None and stop.is_set():
+            raise FetchStopped()
+    
+    def warmup(self) -> Dict:
+        """
+        Load whatever fetch() would otherwise load on first use (called at startup)
+        
+        Returns:
+            Stats about what was loaded (empty if nothing to do)
+        """
+        return {}
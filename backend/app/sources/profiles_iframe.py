@@ -2,7 +2,8 @@
 Country profiles iframe source
 Keyword → dashboard id routing (no intent)
 """
-from typing import List, Dict, Tuple
+import threading
+from typing import List, Dict, Optional, Tuple
 from .base import Source
 from app.engine.targets import to_iso3
 
@@ -82,13 +83,14 @@ class ProfilesIframeSource(Source):
         """
         return f"https://{HOST}/superset/dashboard/{dashboard_id}/?standalone=3&iso3={iso3}"
     
-    def fetch(self, query: str, targets: List[str]) -> List[Dict]:
+    def fetch(self, query: str, targets: List[str], stop: Optional[threading.Event] = None) -> List[Dict]:
         """
-        Fetch iframe embeds for targets
+        Fetch iframe embeds for targets (URL building only; stop is not polled)
         
         Args:
             query: User query string
             targets: List of target keys
+            stop: Unused
             
         Returns:
             List of iframe results
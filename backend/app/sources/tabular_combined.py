@@ -4,15 +4,124 @@ Reads from combined JSONL file with domain field
 Supports both hits (pre-formatted) and combined (raw) formats
 """
 import json
+import mmap
 import os
-from typing import List, Dict, Set
-from .base import Source
+import threading
+import time
+from typing import Callable, List, Dict, Optional, Set, Tuple
+from .base import Source, FetchStopped
 from app.config.paths import get_combined_path, get_hits_path
 from app.engine.targets import to_iso3  # Map country names to ISO3
 
 # Keywords that trigger this source
 KW_COMMIT_OR_LEGIS = ("commit", "legislat", "pledge", "ndc", "target", "law", "regulation", "act", "decree")
 
+# (byte offset, length) of each record, grouped by lowercase target key in file order
+TargetIndex = Dict[str, List[Tuple[int, int]]]
+
+
+class _JsonlSnapshot:
+    """
+    Read-only, memory-mapped JSONL file with a target-key index of record offsets
+
+    Only offsets are kept in the Python heap; records are parsed from the mapping
+    on lookup. The mapped pages live in the OS page cache, so processes forked
+    after loading (app.serve) share them instead of each holding a parsed copy.
+    close() unmaps the file once lookups in flight have finished.
+    """
+
+    def __init__(self, path: str, key_fn: Callable[[Dict], str]):
+        stat = os.stat(path)
+        self.version = (stat.st_mtime_ns, stat.st_size)
+        self.loaded_at = time.time()
+        self.index: TargetIndex = {}
+        self.records = 0
+        self._data = b""
+        self._lock = threading.Lock()
+        self._readers = 0
+        self._closing = False
+        if stat.st_size == 0:
+            return
+
+        with open(path, "rb") as f:
+            # The mapping stays valid after the file is closed
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        data = self._data
+        pos = 0
+        while pos < len(data):
+            end = data.find(b"\n", pos)
+            if end == -1:
+                end = len(data)
+            line = data[pos:end]
+            if line.strip():
+                try:
+                    key = key_fn(json.loads(line))
+                except json.JSONDecodeError:
+                    key = ""
+                if key:
+                    self.index.setdefault(key, []).append((pos, end - pos))
+                    self.records += 1
+            pos = end + 1
+
+    def lookup(self, accept: Set[str]) -> Optional[List[Dict]]:
+        """Parsed records whose target key is in accept, in file order (None once closed)"""
+        with self._lock:
+            if self._closing:
+                return None
+            self._readers += 1
+        try:
+            entries = [entry for key in accept for entry in self.index.get(key, ())]
+            entries.sort()
+            return [json.loads(self._data[offset:offset + length]) for offset, length in entries]
+        finally:
+            with self._lock:
+                self._readers -= 1
+                if self._closing and not self._readers:
+                    self._release()
+
+    def close(self):
+        """Unmap the file now, or when the last lookup in flight finishes"""
+        with self._lock:
+            self._closing = True
+            if not self._readers:
+                self._release()
+
+    def _release(self):
+        # Caller holds the lock
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = b""
+        self.index = {}
+
+
+# path -> snapshot; rebuilt when the file's mtime or size changes
+_SNAPSHOTS: Dict[str, _JsonlSnapshot] = {}
+_SNAPSHOT_LOCK = threading.Lock()
+
+
+def _hit_key(doc: Dict) -> str:
+    return (doc.get("country") or doc.get("target_key") or "").strip().lower()
+
+
+def _combined_key(rec: Dict) -> str:
+    return (rec.get("target_key") or "").strip().lower()
+
+
+def get_index_stats() -> Dict[str, Dict]:
+    """Loaded file snapshots: records, targets, file mtime and load time (epoch seconds)"""
+    return {
+        os.path.abspath(path): {
+            "records": snapshot.records,
+            "targets": len(snapshot.index),
+            "mtime": snapshot.version[0] / 1e9,
+            "size": snapshot.version[1],
+            "loaded_at": snapshot.loaded_at,
+            "mmap": True,
+        }
+        for path, snapshot in list(_SNAPSHOTS.items())
+    }
+
 
 class TabularCombinedSource(Source):
     """
@@ -83,16 +192,70 @@ class TabularCombinedSource(Source):
                 except json.JSONDecodeError:
                     continue
     
-    def fetch(self, query: str, targets: List[str]) -> List[Dict]:
+    def _load_index(self, path: str, key_fn: Callable[[Dict], str]) -> _JsonlSnapshot:
+        """
+        Get the snapshot of a JSONL file (indexed once, again if the file changes)
+        
+        Args:
+            path: Path to JSONL file
+            key_fn: Extracts the lowercase target key of a record
+            
+        Returns:
+            Snapshot with records grouped by target key
+        """
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        snapshot = _SNAPSHOTS.get(path)
+        if snapshot and snapshot.version == version:
+            return snapshot
+        
+        with _SNAPSHOT_LOCK:
+            snapshot = _SNAPSHOTS.get(path)
+            if snapshot and snapshot.version == version:
+                return snapshot
+            
+            old = snapshot
+            snapshot = _JsonlSnapshot(path, key_fn)
+            _SNAPSHOTS[path] = snapshot
+            print(f"📊 Indexed {snapshot.records} records ({len(snapshot.index)} targets) from {path}")
+            if old is not None:
+                # Unmapped once lookups in flight finish (else it stays mapped as long
+                # as any reference survives, indefinitely under gc.freeze)
+                old.close()
+            return snapshot
+    
+    def _lookup(self, path: str, key_fn: Callable[[Dict], str], accept: Set[str]) -> List[Dict]:
+        """Records whose target key is in accept, in file order"""
+        while True:
+            records = self._load_index(path, key_fn).lookup(accept)
+            # None: the snapshot was replaced and closed after we got it; use the new one
+            if records is not None:
+                return records
+    
+    def warmup(self) -> Dict:
+        """Build the hits/combined file indexes before the first query"""
+        stats = {}
+        for name, path, key_fn in (("hits", get_hits_path(), _hit_key),
+                                   ("combined", get_combined_path(), _combined_key)):
+            if path and os.path.exists(path):
+                snapshot = self._load_index(path, key_fn)
+                stats[name] = {"path": path, "targets": len(snapshot.index), "records": snapshot.records}
+        return stats
+    
+    def fetch(self, query: str, targets: List[str], stop: Optional[threading.Event] = None) -> List[Dict]:
         """
         Fetch tabular data for targets
         
         Args:
             query: User query string
             targets: List of target keys
+            stop: Optional flag; checked before each file and each record
             
         Returns:
             List of table results
+            
+        Raises:
+            FetchStopped: If stop is set during the fetch
         """
         hits: List[Dict] = []
         q = query.lower()
@@ -105,13 +268,11 @@ class TabularCombinedSource(Source):
         hits_path = get_hits_path()
         if hits_path and os.path.exists(hits_path):
             print(f"📊 Reading hits file: {hits_path}")
+            self.check_stop(stop)
             try:
-                for doc in self._iter_jsonl(hits_path):
+                for doc in self._lookup(hits_path, _hit_key, accept):
+                    self.check_stop(stop)
                     # Pre-formatted hit structure: {"type":"table","domain":...,"country":...,"table":{...}}
-                    target_key = (doc.get("country") or doc.get("target_key") or "").strip().lower()
-                    if not target_key or target_key not in accept:
-                        continue
-                    
                     # Further filter by keywords: commit / legislat
                     domain = (doc.get("domain") or "").strip().lower()
                     if "commit" in q and domain != "commitment":
@@ -126,6 +287,8 @@ class TabularCombinedSource(Source):
                 if hits:
                     print(f"✓ Found {len(hits)} hits from hits file")
                     return hits  # Return immediately if hits found
+            except FetchStopped:
+                raise
             except Exception as e:
                 print(f"⚠️  Error reading hits file: {e}")
         
@@ -136,12 +299,10 @@ class TabularCombinedSource(Source):
             return hits
         
         print(f"📊 Reading combined file: {combined_path}")
+        self.check_stop(stop)
         try:
-            for rec in self._iter_jsonl(combined_path):
-                target_key = (rec.get("target_key") or "").strip().lower()
-                if not target_key or target_key not in accept:
-                    continue
-                
+            for rec in self._lookup(combined_path, _combined_key, accept):
+                self.check_stop(stop)
                 # Filter by keywords
                 domain = (rec.get("domain") or "").strip().lower()
                 if "commit" in q and domain != "commitment":
@@ -164,6 +325,8 @@ class TabularCombinedSource(Source):
                 })
             
             print(f"✓ Found {len(hits)} hits from combined file")
+        except FetchStopped:
+            raise
         except Exception as e:
             print(f"⚠️  Error reading combined file: {e}")
         
@@ -0,0 +1,163 @@
+"""
+Cold-start audit: import-time report and time-to-first-request check
+
+Usage (from backend/):
+    python -m app.startup_audit                 # import report for app.main
+    python -m app.startup_audit --ttfr          # also time a real server start
+    python -m app.startup_audit --check         # exit 1 if TTFR exceeds the budget
+
+Every measurement runs in a fresh interpreter, so nothing imported by this
+tool skews the numbers.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List
+
+# Time-to-first-request budget (ms): process spawn until /health answers
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "2500"))
+
+# Modules that must not be imported by app.main (loaded on first use instead)
+LAZY_MODULES = (
+    "reportlab",
+    "langgraph",
+    "app.router_graph",
+    "app.rag.embedder",
+    "app.rag.retriever",
+    "app.rag.vectorstore",
+)
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [_BACKEND_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def import_report(module: str = "app.main", top: int = 15) -> Dict:
+    """
+    Profile `import module` with python -X importtime
+
+    Args:
+        module: Module to import
+        top: Number of entries per ranking
+
+    Returns:
+        Dict with total_ms, slowest packages (by self time), slowest app modules
+        (cumulative) and any LAZY_MODULES that were imported eagerly
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=tempfile.gettempdir(), env=_env(), capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    packages = defaultdict(int)
+    app_modules = {}
+    imported = set()
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        imported.add(name)
+        packages[name.split(".")[0]] += int(self_us)
+        if name == module:
+            total_us = int(cumulative_us)
+        if name.startswith("app."):
+            app_modules[name] = int(cumulative_us)
+
+    def ranked(items: Dict[str, int]) -> List[Dict]:
+        return [{"module": name, "ms": round(us / 1000, 1)}
+                for name, us in sorted(items.items(), key=lambda kv: -kv[1])[:top]]
+
+    return {
+        "module": module,
+        "total_ms": round(total_us / 1000, 1),
+        "packages": ranked(packages),
+        "app_modules": ranked(app_modules),
+        "eager_lazy_modules": sorted(m for m in LAZY_MODULES if m in imported),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_time_to_first_request(path: str = "/health", timeout: float = 60.0) -> float:
+    """
+    Start uvicorn with app.main:app and time until path answers 200
+
+    Returns:
+        Milliseconds from process spawn to the first successful response
+    """
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+    # Run from a scratch directory: startup creates chatbot.db in the working directory
+    workdir = tempfile.TemporaryDirectory()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=workdir.name, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited during startup:\n{server.stderr.read().decode()[-2000:]}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return round((time.perf_counter() - start) * 1000, 1)
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"{url} did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+        workdir.cleanup()
+
+
+def _main(argv: List[str]) -> int:
+    report = import_report()
+    print(f"⏱️  import app.main: {report['total_ms']} ms")
+    print("   slowest packages (self time):")
+    for entry in report["packages"][:10]:
+        print(f"     {entry['ms']:>8.1f} ms  {entry['module']}")
+    print("   slowest app modules (cumulative):")
+    for entry in report["app_modules"][:10]:
+        print(f"     {entry['ms']:>8.1f} ms  {entry['module']}")
+
+    failed = False
+    if report["eager_lazy_modules"]:
+        print(f"❌ Imported at startup but should be lazy: {', '.join(report['eager_lazy_modules'])}")
+        failed = True
+
+    if "--ttfr" in argv or "--check" in argv:
+        runs = [measure_time_to_first_request() for _ in range(3)]
+        best = min(runs)
+        print(f"⏱️  time to first request: {best} ms (best of {json.dumps(runs)}; budget {STARTUP_BUDGET_MS:.0f} ms)")
+        if best > STARTUP_BUDGET_MS:
+            print("❌ Time to first request is over budget")
+            failed = True
+
+    if "--check" in argv:
+        print("❌ Startup check failed" if failed else "✅ Startup check passed")
+        return 1 if failed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
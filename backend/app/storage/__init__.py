@@ -0,0 +1,70 @@
+"""
+Conversation storage backends, selected by DATABASE_URL
+
+    sqlite:///./chatbot.db   SQLite file (relative path)
+    sqlite:////data/chat.db  SQLite file (absolute path)
+    memory://                In-process memory (not persisted)
+"""
+import os
+from typing import Optional
+
+from app.storage.base import ConversationStore
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./chatbot.db")
+
+_store: Optional[ConversationStore] = None
+
+
+def create_store(url: str) -> ConversationStore:
+    """
+    Create a conversation store from a database URL
+
+    Args:
+        url: sqlite:///<path> or memory://
+
+    Returns:
+        ConversationStore instance
+
+    Raises:
+        ValueError: For unsupported URL schemes
+    """
+    scheme, sep, rest = url.partition("://")
+    if not sep:
+        raise ValueError(f"Invalid DATABASE_URL: {url!r}")
+    scheme = scheme.lower()
+
+    if scheme == "sqlite":
+        from app.storage.sqlite import SqliteConversationStore
+        # sqlite:///relative.db -> "relative.db", sqlite:////abs.db -> "/abs.db"
+        path = rest[1:] if rest.startswith("/") else rest
+        if not path or path == ":memory:":
+            raise ValueError("sqlite:// needs a file path (use memory:// for an in-memory store)")
+        path = os.path.normpath(path)
+        from app.database import db
+        if os.path.abspath(path) == os.path.abspath(db.db_path):
+            # Share the application Database (schema already initialized)
+            return SqliteConversationStore(database=db)
+        return SqliteConversationStore(path)
+
+    if scheme == "memory":
+        from app.storage.memory import MemoryConversationStore
+        return MemoryConversationStore()
+
+    raise ValueError(f"Unsupported DATABASE_URL scheme: {scheme!r} (expected sqlite or memory)")
+
+
+def get_store() -> ConversationStore:
+    """Get the application conversation store (created from DATABASE_URL on first use)"""
+    global _store
+    if _store is None:
+        _store = create_store(DATABASE_URL)
+        print(f"🗄️  Conversation store: {type(_store).__name__} ({DATABASE_URL})")
+    return _store
+
+
+def get_database():
+    """SQLite Database of the application store (None when DATABASE_URL is not SQLite)"""
+    return get_store().get_database()
+
+
+__all__ = ["ConversationStore", "DATABASE_URL", "create_store", "get_store", "get_database"]
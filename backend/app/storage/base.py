@@ -0,0 +1,100 @@
+"""
+Async conversation store interface
+Callers depend on this interface only; the backend is chosen by DATABASE_URL
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# (session_id, role, content)
+NewMessage = Tuple[str, str, str]
+
+ROLES = ("user", "assistant")
+
+
+class ConversationStore:
+    """
+    Base class for conversation storage backends
+
+    Return shapes match app.database.Database:
+    - messages: {'id', 'role', 'content', 'created_at'}
+    - sessions: {'session_id', 'created_at', 'last_message_at', 'last_message_id',
+      'message_count', 'last_role'}
+    Message ids increase monotonically and are used as pagination cursors.
+    """
+
+    async def save_message(self, session_id: str, role: str, content: str) -> int:
+        """
+        Save a message
+
+        Returns:
+            Message ID
+        """
+        ids = await self.save_messages([(session_id, role, content)])
+        return ids[0]
+
+    async def save_messages(self, messages: Sequence[NewMessage]) -> List[int]:
+        """
+        Save several messages atomically
+
+        Args:
+            messages: (session_id, role, content) tuples, in order
+
+        Returns:
+            Message IDs, in input order
+        """
+        raise NotImplementedError
+
+    async def get_history(self, session_id: str, after_id: Optional[int] = None, limit: int = 50) -> Dict:
+        """
+        Get one page of a session's messages, oldest first
+
+        Returns:
+            Dict with messages, next_after_id and has_more
+        """
+        raise NotImplementedError
+
+    async def list_sessions(self, before_id: Optional[int] = None, limit: int = 50) -> Dict:
+        """
+        Get one page of sessions, most recently active first
+
+        Returns:
+            Dict with sessions, next_before_id and has_more
+        """
+        raise NotImplementedError
+
+    async def get_session(self, session_id: str) -> Optional[Dict]:
+        """Get a session summary (None if the session has no messages)"""
+        raise NotImplementedError
+
+    async def delete_conversation(self, session_id: str) -> int:
+        """
+        Delete all messages of a session
+
+        Returns:
+            Number of deleted messages
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        """Release backend resources"""
+
+    def get_database(self):
+        """
+        SQLite Database behind this store, if any
+
+        Used for maintenance that only exists for SQLite files: schema
+        migrations, retention/compaction and storage statistics.
+
+        Returns:
+            app.database.Database, or None (e.g. in-memory store)
+        """
+        return None
+
+    def get_stats(self) -> Dict:
+        """Backend status (synchronous and cheap; used by /stats)"""
+        return {"backend": type(self).__name__}
+
+
+def validate_role(role: str):
+    """Raise ValueError for roles the schema does not accept"""
+    if role not in ROLES:
+        raise ValueError(f"Invalid role: {role!r} (expected one of {ROLES})")
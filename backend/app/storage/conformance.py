@@ -0,0 +1,212 @@
+"""
+Conformance and throughput checks shared by all ConversationStore backends
+
+Usage (from backend/):
+    python -m app.storage.conformance [url ...]
+
+Defaults to memory:// and a temporary sqlite:/// file; URLs given on the
+command line must point at empty stores. A new backend passes
+when run_conformance() completes without an AssertionError.
+"""
+import asyncio
+import os
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from app.storage import create_store
+from app.storage.base import ConversationStore
+
+StoreFactory = Callable[[], ConversationStore]
+
+
+async def _check_messages(store: ConversationStore):
+    first = await store.save_message("conf-a", "user", "hello")
+    second = await store.save_message("conf-a", "assistant", "hi there")
+    assert second > first, "message ids must increase"
+
+    page = await store.get_history("conf-a")
+    assert [m["id"] for m in page["messages"]] == [first, second]
+    assert [m["role"] for m in page["messages"]] == ["user", "assistant"]
+    assert page["messages"][1]["content"] == "hi there"
+    assert page["messages"][0]["created_at"], "created_at must be set"
+    assert page["has_more"] is False and page["next_after_id"] is None
+
+    empty = await store.get_history("conf-missing")
+    assert empty["messages"] == [] and empty["has_more"] is False
+
+    try:
+        await store.save_message("conf-a", "system", "nope")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("invalid roles must raise ValueError")
+
+
+async def _check_batch_and_pagination(store: ConversationStore):
+    batch = [("conf-b", "user" if i % 2 == 0 else "assistant", f"message {i}") for i in range(25)]
+    ids = await store.save_messages(batch)
+    assert len(ids) == 25 and ids == sorted(ids) and len(set(ids)) == 25, "batch ids must be ascending"
+    assert await store.save_messages([]) == []
+
+    # Walk all pages with the cursor
+    seen, after_id, pages = [], None, 0
+    while True:
+        page = await store.get_history("conf-b", after_id=after_id, limit=10)
+        seen.extend(m["content"] for m in page["messages"])
+        pages += 1
+        if not page["has_more"]:
+            assert page["next_after_id"] is None
+            break
+        after_id = page["next_after_id"]
+    assert pages == 3
+    assert seen == [content for _, _, content in batch], "pages must cover every message once, in order"
+
+    # Batches may interleave sessions
+    mixed = await store.save_messages([("conf-c", "user", "c1"), ("conf-d", "user", "d1"), ("conf-c", "assistant", "c2")])
+    assert [m["content"] for m in (await store.get_history("conf-c"))["messages"]] == ["c1", "c2"]
+    assert (await store.get_history("conf-d"))["messages"][0]["id"] == mixed[1]
+
+
+async def _check_sessions(store: ConversationStore):
+    session = await store.get_session("conf-b")
+    assert session["message_count"] == 25 and session["last_role"] == "user"
+    assert await store.get_session("conf-missing") is None
+
+    # conf-a is now the least recently active; write to it to move it first
+    last_id = await store.save_message("conf-a", "user", "back again")
+    session = await store.get_session("conf-a")
+    assert session["last_message_id"] == last_id and session["message_count"] == 3
+
+    order, before_id = [], None
+    while True:
+        page = await store.list_sessions(before_id=before_id, limit=2)
+        order.extend(s["session_id"] for s in page["sessions"])
+        if not page["has_more"]:
+            break
+        before_id = page["next_before_id"]
+    assert order == ["conf-a", "conf-c", "conf-d", "conf-b"], f"unexpected session order {order}"
+
+
+async def _check_delete(store: ConversationStore):
+    assert await store.delete_conversation("conf-c") == 2
+    assert (await store.get_history("conf-c"))["messages"] == []
+    assert await store.get_session("conf-c") is None
+    assert "conf-c" not in [s["session_id"] for s in (await store.list_sessions(limit=100))["sessions"]]
+    assert await store.delete_conversation("conf-c") == 0
+
+
+CHECKS: List[Callable[[ConversationStore], Awaitable[None]]] = [
+    _check_messages,
+    _check_batch_and_pagination,
+    _check_sessions,
+    _check_delete,
+]
+
+
+async def run_conformance(factory: StoreFactory) -> List[str]:
+    """
+    Run every check against a fresh (empty) store
+
+    Args:
+        factory: Returns a new, empty store
+
+    Returns:
+        Names of the checks that passed (raises AssertionError on the first failure)
+    """
+    store = factory()
+    passed = []
+    try:
+        for check in CHECKS:
+            await check(store)
+            passed.append(check.__name__.lstrip("_"))
+    finally:
+        await store.close()
+    return passed
+
+
+async def run_throughput(factory: StoreFactory, messages: int = 2000, batch_size: int = 100,
+                         concurrency: int = 20) -> Dict:
+    """
+    Measure write and read throughput of a fresh store
+
+    Args:
+        factory: Returns a new, empty store
+        messages: Messages written per scenario
+        batch_size: Messages per save_messages call
+        concurrency: Concurrent writers for the single-insert scenario
+
+    Returns:
+        Operations per second per scenario and the event loop's worst stall (ms)
+    """
+    store = factory()
+    results = {}
+    stalls = []
+
+    async def watchdog(stop: asyncio.Event):
+        # A non-blocking store keeps the loop responsive while queries run
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append((time.perf_counter() - start - 0.005) * 1000)
+
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watchdog(stop))
+    try:
+        async def writer(worker: int):
+            for i in range(messages // concurrency):
+                await store.save_message(f"tp-single-{worker}", "user", f"message {i}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(writer(w) for w in range(concurrency)))
+        results["single_insert_per_s"] = round(messages / (time.perf_counter() - start))
+
+        start = time.perf_counter()
+        for offset in range(0, messages, batch_size):
+            await store.save_messages([
+                ("tp-batch", "user", f"message {i}") for i in range(offset, min(offset + batch_size, messages))
+            ])
+        results["batch_insert_per_s"] = round(messages / (time.perf_counter() - start))
+
+        start, after_id, pages = time.perf_counter(), None, 0
+        while True:
+            page = await store.get_history("tp-batch", after_id=after_id, limit=50)
+            pages += 1
+            if not page["has_more"]:
+                break
+            after_id = page["next_after_id"]
+        results["history_pages_per_s"] = round(pages / (time.perf_counter() - start))
+
+        start = time.perf_counter()
+        for _ in range(100):
+            await store.list_sessions(limit=50)
+        results["session_pages_per_s"] = round(100 / (time.perf_counter() - start))
+    finally:
+        stop.set()
+        await watcher
+        await store.close()
+
+    results["max_loop_stall_ms"] = round(max(stalls, default=0.0), 2)
+    return results
+
+
+async def _main(urls: List[str]):
+    tmpdir = tempfile.TemporaryDirectory()
+    if not urls:
+        urls = ["memory://", f"sqlite:///{os.path.join(tmpdir.name, 'conformance.db')}"]
+
+    for url in urls:
+        print(f"🗄️  {url}")
+        passed = await run_conformance(lambda: create_store(url))
+        print(f"   ✅ conformance: {', '.join(passed)}")
+
+        throughput_url = url
+        if url.startswith("sqlite"):
+            throughput_url = f"sqlite:///{os.path.join(tmpdir.name, 'throughput.db')}"
+        print(f"   ⏱️  throughput: {await run_throughput(lambda: create_store(throughput_url))}")
+    tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    import sys
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,99 @@
+"""
+In-memory conversation store (tests, local development, single-process deployments)
+"""
+import asyncio
+import bisect
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+from app.storage.base import ConversationStore, NewMessage, validate_role
+
+
+class MemoryConversationStore(ConversationStore):
+    """Conversations kept in process memory; lost on restart"""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._next_id = 1
+        # session_id -> messages in id order
+        self._messages: Dict[str, List[Dict]] = {}
+        # session_id -> summary
+        self._sessions: Dict[str, Dict] = {}
+        # Sorted (last_message_id, session_id) for keyset session listing
+        self._activity: List[tuple] = []
+
+    async def save_messages(self, messages: Sequence[NewMessage]) -> List[int]:
+        for _, role, _ in messages:
+            validate_role(role)
+
+        async with self._lock:
+            now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+            ids = []
+            for session_id, role, content in messages:
+                message_id = self._next_id
+                self._next_id += 1
+                ids.append(message_id)
+                self._messages.setdefault(session_id, []).append({
+                    'id': message_id, 'role': role, 'content': content, 'created_at': now
+                })
+
+                summary = self._sessions.get(session_id)
+                if summary is None:
+                    summary = {'session_id': session_id, 'created_at': now, 'message_count': 0}
+                    self._sessions[session_id] = summary
+                else:
+                    self._activity.pop(bisect.bisect_left(self._activity, (summary['last_message_id'], session_id)))
+                summary.update({
+                    'last_message_at': now,
+                    'last_message_id': message_id,
+                    'message_count': summary['message_count'] + 1,
+                    'last_role': role,
+                })
+                # New ids are the largest, so this is an append
+                self._activity.append((message_id, session_id))
+            return ids
+
+    async def get_history(self, session_id: str, after_id: Optional[int] = None, limit: int = 50) -> Dict:
+        messages = self._messages.get(session_id, [])
+        start = bisect.bisect_right(messages, after_id, key=lambda m: m['id']) if after_id else 0
+        page = [dict(m) for m in messages[start:start + limit + 1]]
+
+        has_more = len(page) > limit
+        page = page[:limit]
+        return {
+            'messages': page,
+            'next_after_id': page[-1]['id'] if has_more else None,
+            'has_more': has_more
+        }
+
+    async def list_sessions(self, before_id: Optional[int] = None, limit: int = 50) -> Dict:
+        end = len(self._activity) if before_id is None else bisect.bisect_left(self._activity, (before_id, ""))
+        picked = self._activity[max(0, end - limit - 1):end][::-1]
+        sessions = [dict(self._sessions[session_id]) for _, session_id in picked]
+
+        has_more = len(sessions) > limit
+        sessions = sessions[:limit]
+        return {
+            'sessions': sessions,
+            'next_before_id': sessions[-1]['last_message_id'] if has_more else None,
+            'has_more': has_more
+        }
+
+    async def get_session(self, session_id: str) -> Optional[Dict]:
+        summary = self._sessions.get(session_id)
+        return dict(summary) if summary else None
+
+    async def delete_conversation(self, session_id: str) -> int:
+        async with self._lock:
+            messages = self._messages.pop(session_id, [])
+            summary = self._sessions.pop(session_id, None)
+            if summary is not None:
+                self._activity.pop(bisect.bisect_left(self._activity, (summary['last_message_id'], session_id)))
+            return len(messages)
+
+    def get_stats(self) -> Dict:
+        return {
+            "backend": type(self).__name__,
+            "sessions": len(self._sessions),
+            "messages": sum(len(m) for m in self._messages.values()),
+        }
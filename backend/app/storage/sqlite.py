@@ -0,0 +1,76 @@
+"""
+SQLite conversation store
+Runs app.database.Database calls on a dedicated worker thread (the aiosqlite
+approach), so queries never block the event loop
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Sequence
+
+from app.database import Database
+from app.storage.base import ConversationStore, NewMessage, validate_role
+
+
+class SqliteConversationStore(ConversationStore):
+    """Async wrapper around Database with one worker thread per store"""
+
+    def __init__(self, db_path: str = "chatbot.db", database: Optional[Database] = None):
+        """
+        Args:
+            db_path: SQLite file path
+            database: Existing Database to wrap (db_path is ignored)
+        """
+        self.db = database or Database(db_path)
+        self.db_path = self.db.db_path
+        # A single thread serializes writes like aiosqlite's connection thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-store")
+        # Calls submitted and not yet finished (running + queued)
+        self._pending = 0
+        self._completed = 0
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        self._pending += 1
+        try:
+            return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+        finally:
+            self._pending -= 1
+            self._completed += 1
+
+    async def save_message(self, session_id: str, role: str, content: str) -> int:
+        validate_role(role)
+        return await self._run(self.db.save_message, session_id, role, content)
+
+    async def save_messages(self, messages: Sequence[NewMessage]) -> List[int]:
+        messages = list(messages)
+        for _, role, _ in messages:
+            validate_role(role)
+        return await self._run(self.db.save_messages, messages)
+
+    async def get_history(self, session_id: str, after_id: Optional[int] = None, limit: int = 50) -> Dict:
+        return await self._run(self.db.get_history, session_id, after_id=after_id, limit=limit)
+
+    async def list_sessions(self, before_id: Optional[int] = None, limit: int = 50) -> Dict:
+        return await self._run(self.db.list_sessions, before_id=before_id, limit=limit)
+
+    async def get_session(self, session_id: str) -> Optional[Dict]:
+        return await self._run(self.db.get_session, session_id)
+
+    async def delete_conversation(self, session_id: str) -> int:
+        return await self._run(self.db.delete_conversation, session_id)
+
+    async def close(self):
+        self._executor.shutdown(wait=True)
+
+    def get_database(self) -> Database:
+        return self.db
+
+    def get_stats(self) -> Dict:
+        return {
+            "backend": type(self).__name__,
+            "path": self.db_path,
+            "workers": 1,
+            "pending": self._pending,
+            "completed": self._completed,
+        }
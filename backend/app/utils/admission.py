@@ -0,0 +1,339 @@
+"""
+Adaptive admission control (concurrency limit + load shedding) for query endpoints
+
+The number of concurrent requests is capped by a limit that adapts with AIMD:
+fast completions while the limit is in use raise it by about one per limit's
+worth of requests; a completion slower than the latency target (or failing)
+cuts it by BACKOFF. Requests over the limit wait in a short, bounded queue;
+when the queue is full or the wait times out they get 503 with Retry-After
+instead of piling up inside uvicorn, so admitted requests keep their latency.
+
+Each worker process has its own controller (limits are per process).
+
+Usage (benchmark, from backend/):
+    python -m app.utils.admission
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Sequence
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_INITIAL_LIMIT = int(os.getenv("ADMISSION_INITIAL_LIMIT", "8"))
+ADMISSION_MIN_LIMIT = int(os.getenv("ADMISSION_MIN_LIMIT", "2"))
+ADMISSION_MAX_LIMIT = int(os.getenv("ADMISSION_MAX_LIMIT", "64"))
+# Completions slower than this (time to response start) shrink the limit
+ADMISSION_TARGET_MS = float(os.getenv("ADMISSION_TARGET_MS", "1000"))
+# Requests allowed to wait for a slot, and for how long
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "16"))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "500"))
+
+# Paths under admission control (health checks must always answer)
+ADMISSION_PATHS = ("/query", "/api/dify/")
+ADMISSION_EXCLUDED_PATHS = ("/api/dify/health",)
+
+# Multiplicative decrease factor
+_BACKOFF = 0.9
+# Smoothing factor for the average latency
+_EMA_ALPHA = 0.2
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    AIMD concurrency limit with a bounded wait queue
+
+    Runs on the event loop (not thread-safe): acquire() before handling a
+    request, release() with its latency afterwards.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = ADMISSION_INITIAL_LIMIT,
+        min_limit: int = ADMISSION_MIN_LIMIT,
+        max_limit: int = ADMISSION_MAX_LIMIT,
+        target_ms: float = ADMISSION_TARGET_MS,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        queue_timeout_ms: float = ADMISSION_QUEUE_TIMEOUT_MS
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.target_ms = target_ms
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout = queue_timeout_ms / 1000
+        self.in_flight = 0
+        self.latency_ms: Optional[float] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        # Counters
+        self.admitted = 0
+        self.queued = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "queue_timeout": 0}
+        self.increases = 0
+        self.decreases = 0
+        self.peak_in_flight = 0
+        self.peak_queue = 0
+
+    async def acquire(self):
+        """
+        Take a slot, waiting in the queue if the limit is reached
+
+        Raises:
+            Overloaded: Queue full or wait timed out
+        """
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self._admit()
+            return
+        if len(self._waiters) >= self.queue_size:
+            self.rejected["queue_full"] += 1
+            raise Overloaded("queue_full", self.retry_after())
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        timer = loop.call_later(self.queue_timeout, _expire, waiter)
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.peak_queue = max(self.peak_queue, len(self._waiters))
+        try:
+            # Resolved by release() once the slot has been handed over
+            await waiter
+        except asyncio.TimeoutError:
+            self.rejected["queue_timeout"] += 1
+            raise Overloaded("queue_timeout", self.retry_after())
+        except asyncio.CancelledError:
+            # Client gone after the slot was handed over: pass it on
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self.release(None)
+            raise
+        finally:
+            timer.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self, latency_ms: Optional[float], ok: bool = True):
+        """
+        Free a slot and adapt the limit
+
+        Args:
+            latency_ms: Time to response start (None: no sample, e.g. client gone)
+            ok: False if the request failed (counts as overload)
+        """
+        self.in_flight -= 1
+        if latency_ms is not None:
+            self._update_limit(latency_ms, ok)
+        self._wake()
+
+    def _admit(self):
+        self.in_flight += 1
+        self.admitted += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._admit()
+                waiter.set_result(None)
+
+    def _update_limit(self, latency_ms: float, ok: bool):
+        avg = self.latency_ms
+        self.latency_ms = latency_ms if avg is None else avg + _EMA_ALPHA * (latency_ms - avg)
+
+        if not ok or latency_ms > self.target_ms:
+            # Requests finishing right after a decrease were admitted under the old
+            # limit, so back off at most once per (average) request duration
+            now = time.monotonic()
+            if now - self._last_decrease >= self.latency_ms / 1000:
+                self._last_decrease = now
+                self.limit = max(float(self.min_limit), self.limit * _BACKOFF)
+                self.decreases += 1
+        elif (self.in_flight + 1) * 2 >= self.limit and self.limit < self.max_limit:
+            # Only grow while at least half the limit is in use, otherwise light
+            # traffic would drift the limit up to the maximum
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self.increases += 1
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained (at least 1)"""
+        latency = (self.latency_ms or self.target_ms) / 1000
+        return max(1, math.ceil(latency * (len(self._waiters) + 1) / int(self.limit)))
+
+    def get_stats(self) -> Dict:
+        return {
+            "limit": int(self.limit),
+            "limit_exact": round(self.limit, 2),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "target_ms": self.target_ms,
+            "in_flight": self.in_flight,
+            "queue": len(self._waiters),
+            "queue_size": self.queue_size,
+            "queue_timeout_ms": self.queue_timeout * 1000,
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": dict(self.rejected),
+            "rejected_total": sum(self.rejected.values()),
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "peak_in_flight": self.peak_in_flight,
+            "peak_queue": self.peak_queue,
+        }
+
+
+def _expire(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_exception(asyncio.TimeoutError())
+
+
+# Global controller instance (one per worker process)
+admission_controller = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController to selected path prefixes
+
+    Latency is measured to the response start, so event streams hold their slot
+    until they end but do not count their streaming time as latency.
+    """
+
+    def __init__(
+        self,
+        app,
+        controller: Optional[AdmissionController] = None,
+        paths: Sequence[str] = ADMISSION_PATHS,
+        excluded_paths: Sequence[str] = ADMISSION_EXCLUDED_PATHS
+    ):
+        self.app = app
+        self.controller = controller or admission_controller
+        self.paths = tuple(paths)
+        self.excluded_paths = tuple(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not scope["path"].startswith(self.paths)
+                or scope["path"].startswith(self.excluded_paths)):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.controller.acquire()
+        except Overloaded as e:
+            await _send_overloaded(send, e)
+            return
+
+        start = time.perf_counter()
+        latency_ms: Optional[float] = None
+        ok = True
+
+        async def send_wrapper(message):
+            nonlocal latency_ms, ok
+            if message["type"] == "http.response.start":
+                latency_ms = (time.perf_counter() - start) * 1000
+                ok = message.get("status", 200) < 500
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            ok = False
+            if latency_ms is None:
+                latency_ms = (time.perf_counter() - start) * 1000
+            raise
+        finally:
+            self.controller.release(latency_ms, ok)
+
+
+async def _send_overloaded(send, error: Overloaded):
+    body = json.dumps({"msg": "Server busy, please retry later", "reason": error.reason}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(error.retry_after).encode("latin-1")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def get_admission_stats() -> Dict:
+    """Limit, queue and rejection counters"""
+    return {"enabled": ADMISSION_ENABLED, **admission_controller.get_stats()}
+
+
+# --- Benchmark ---
+def _bench_admission(requests: int = 300, arrival_ms: float = 3.0, service_ms: float = 10.0):
+    """
+    Burst against a backend that serves one request at a time (1 CPU):
+    latency of answered requests with and without admission control
+    """
+
+    async def backend(scope, receive, send):
+        async with cpu:
+            await asyncio.sleep(service_ms / 1000)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def one(app, results):
+        start = time.perf_counter()
+        status = {}
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+
+        await app({"type": "http", "path": "/query", "headers": []}, receive, send)
+        results.append((status["code"], (time.perf_counter() - start) * 1000))
+
+    async def burst(app):
+        results = []
+        tasks = []
+        for _ in range(requests):
+            tasks.append(asyncio.create_task(one(app, results)))
+            await asyncio.sleep(arrival_ms / 1000)
+        await asyncio.gather(*tasks)
+        return results
+
+    def pct(values, p):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+    print("=" * 72)
+    print(f"Admission: {requests} requests every {arrival_ms} ms, "
+          f"backend {service_ms} ms serial ({1000 / arrival_ms / (1000 / service_ms):.1f}x capacity)")
+    print("=" * 72)
+    print(f"{'mode':<12} {'ok':>5} {'503':>5} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'limit':>6}")
+    for mode in ("none", "admission"):
+        cpu = asyncio.Lock()
+        controller = AdmissionController(initial_limit=8, target_ms=100, queue_size=8, queue_timeout_ms=200)
+        app = backend if mode == "none" else AdmissionMiddleware(backend, controller)
+        results = asyncio.run(burst(app))
+        ok = [ms for code, ms in results if code == 200]
+        limit = controller.get_stats()["limit"] if mode != "none" else "-"
+        print(f"{mode:<12} {len(ok):>5} {len(results) - len(ok):>5} {pct(ok, 0.5):>8.0f} "
+              f"{pct(ok, 0.99):>8.0f} {max(ok, default=0):>8.0f} {limit:>6}")
+
+
+if __name__ == "__main__":
+    _bench_admission()
@@ -0,0 +1,162 @@
+"""
+Client-disconnect cancellation helpers
+Stops query work for abandoned requests and counts the work saved (or not)
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Smoothing factor for the average duration of completed requests
+_EMA_ALPHA = 0.2
+
+
+class ClientDisconnected(Exception):
+    """Raised between stages when the client has gone away"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"client disconnected before {stage}")
+        self.stage = stage
+
+
+class CancellationStats:
+    """
+    Counters for cancelled requests and the source fetches they stopped
+
+    Threads cannot be interrupted, so work is only saved when a source fetch
+    sees the request's stop flag: either before it starts (skipped) or part way
+    through (stopped early). Saved time is estimated per source as its average
+    completed fetch duration minus the time the fetch had already run. Fetches
+    that ran to completion after the client left are counted as wasted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._avg_ms: Dict[str, float] = {}
+        self._avg_fetch_ms: Dict[str, float] = {}
+        self.completed = 0
+        self.cancelled = 0
+        self.by_stage: Dict[str, int] = {}
+        self.fetches_stopped = 0
+        self.fetches_wasted = 0
+        self.saved_ms = 0.0
+        self.wasted_ms = 0.0
+
+    def record_completed(self, kind: str, elapsed_ms: float):
+        """Update the average duration of a request kind"""
+        with self._lock:
+            self.completed += 1
+            self._avg_ms[kind] = _ema(self._avg_ms.get(kind), elapsed_ms)
+
+    def record_cancelled(self, kind: str, stage: str):
+        """Count a request abandoned by its client"""
+        with self._lock:
+            self.cancelled += 1
+            self.by_stage[stage] = self.by_stage.get(stage, 0) + 1
+
+    def record_fetch(self, source: str, elapsed_ms: float, stopped: bool, cancelled: bool) -> float:
+        """
+        Record a finished source fetch
+
+        Args:
+            source: Source name
+            elapsed_ms: Time the fetch ran (0 if skipped before starting)
+            stopped: The fetch returned early because of the stop flag
+            cancelled: The request was cancelled (results are discarded)
+
+        Returns:
+            Estimated milliseconds saved by stopping (0 if not stopped)
+        """
+        with self._lock:
+            if not cancelled:
+                self._avg_fetch_ms[source] = _ema(self._avg_fetch_ms.get(source), elapsed_ms)
+                return 0.0
+            if not stopped:
+                self.fetches_wasted += 1
+                self.wasted_ms += elapsed_ms
+                return 0.0
+            saved = max(0.0, self._avg_fetch_ms.get(source, 0.0) - elapsed_ms)
+            self.fetches_stopped += 1
+            self.saved_ms += saved
+            return saved
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "by_stage": dict(self.by_stage),
+                "fetches_stopped": self.fetches_stopped,
+                "saved_ms": round(self.saved_ms, 1),
+                "fetches_wasted": self.fetches_wasted,
+                "wasted_ms": round(self.wasted_ms, 1),
+                "avg_request_ms": {k: round(v, 1) for k, v in self._avg_ms.items()},
+                "avg_fetch_ms": {k: round(v, 1) for k, v in self._avg_fetch_ms.items()},
+            }
+
+
+def _ema(avg: Optional[float], value: float) -> float:
+    return value if avg is None else avg + _EMA_ALPHA * (value - avg)
+
+
+# Global stats instance
+cancellation_stats = CancellationStats()
+
+
+class RequestGuard:
+    """
+    Tracks one request's progress and stops it when the client disconnects
+
+    Usage:
+        guard = RequestGuard(request, "query")
+        await guard.check("dispatch")   # raises ClientDisconnected
+        ...
+        guard.done()
+
+    guard.stop is set once the client is gone; source fetches running in
+    worker threads poll it and return early.
+    """
+
+    def __init__(self, request: Optional[Any], kind: str):
+        """
+        Args:
+            request: Incoming request (None disables disconnect checks)
+            kind: Request kind used to average durations (e.g. "query", "stream")
+        """
+        self.request = request
+        self.kind = kind
+        self.start = time.time()
+        # Set on disconnect; read from worker threads
+        self.stop = threading.Event()
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.time() - self.start) * 1000
+
+    async def is_disconnected(self) -> bool:
+        if self.request is None:
+            return False
+        try:
+            return await self.request.is_disconnected()
+        except Exception:
+            return False
+
+    async def check(self, stage: str):
+        """Raise ClientDisconnected if the client has gone away before a stage"""
+        if await self.is_disconnected():
+            self.stop.set()
+            raise ClientDisconnected(stage)
+
+    def cancelled(self, stage: str):
+        """Record this request as cancelled at a stage"""
+        self.stop.set()
+        cancellation_stats.record_cancelled(self.kind, stage)
+        print(f"🔌 {self.kind}: client disconnected before {stage} (after {self.elapsed_ms:.0f} ms)")
+
+    def done(self):
+        """Record this request as completed"""
+        cancellation_stats.record_completed(self.kind, self.elapsed_ms)
+
+
+def get_cancellation_stats() -> Dict[str, Any]:
+    """Cancellation counters for monitoring"""
+    return cancellation_stats.get_stats()
@@ -0,0 +1,342 @@
+"""
+Response compression with Accept-Encoding negotiation
+Gzip always; zstd and brotli when the optional codecs are installed
+
+Usage (benchmark, from backend/):
+    python -m app.utils.compression
+"""
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Optional codecs
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+# Responses smaller than this are sent as-is (compression overhead > savings)
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+# Number of compressed bodies kept for identical responses (static files, repeated queries)
+COMPRESSION_CACHE_SIZE = int(os.getenv("COMPRESSION_CACHE_SIZE", "256"))
+# Bodies larger than this are compressed but not cached
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(4 * 1024 * 1024)))
+
+# Paths whose responses are compressed
+COMPRESSED_PATHS = ("/query", "/api/dify/chat", "/static-data")
+
+# Content types worth compressing
+_COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+
+
+def _gzip(data: bytes) -> bytes:
+    # Level 6: close to level 9 ratio on JSON at a fraction of the CPU
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _zstd(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def _brotli(data: bytes) -> bytes:
+    # Quality 5: good ratio while staying fast enough for dynamic responses
+    return brotli.compress(data, quality=5)
+
+
+def available_encodings() -> List[str]:
+    """Supported encodings in server preference order"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+_COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {"gzip": _gzip, "zstd": _zstd, "br": _brotli}
+
+
+def negotiate_encoding(accept_encoding: str, supported: Optional[Sequence[str]] = None) -> Optional[str]:
+    """
+    Pick a content encoding from an Accept-Encoding header
+
+    Highest client q-value wins; ties go to server preference order.
+
+    Args:
+        accept_encoding: Raw Accept-Encoding header value
+        supported: Encodings to choose from (defaults to available_encodings())
+
+    Returns:
+        Encoding name, or None for identity
+    """
+    if not accept_encoding:
+        return None
+    supported = list(supported if supported is not None else available_encodings())
+
+    q_values: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        q_values[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = q_values.get(encoding, q_values.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressedCache:
+    """LRU of compressed bodies keyed on (content hash, encoding)"""
+
+    def __init__(self, max_size: int = COMPRESSION_CACHE_SIZE, max_body_bytes: int = COMPRESSION_CACHE_MAX_BYTES):
+        self.max_size = max_size
+        self.max_body_bytes = max_body_bytes
+        self._entries: "OrderedDict[Tuple[bytes, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        """Compressed body, reusing a cached variant for identical content"""
+        if self.max_size <= 0 or len(body) > self.max_body_bytes:
+            return _COMPRESSORS[encoding](body)
+
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        compressed = _COMPRESSORS[encoding](body)
+        with self._lock:
+            self._entries[key] = compressed
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return compressed
+
+    def get_stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global cache instance
+compressed_cache = CompressedCache()
+
+
+def _add_vary(headers: List[Tuple[bytes, bytes]], field: bytes) -> List[Tuple[bytes, bytes]]:
+    """
+    Add a field to the Vary header, keeping existing values (e.g. Origin from CORS)
+
+    Returns:
+        Headers with a single merged Vary header
+    """
+    values = []
+    for k, v in headers:
+        if k.lower() == b"vary":
+            values += [item.strip() for item in v.split(b",") if item.strip()]
+    if b"*" not in values and field.lower() not in (item.lower() for item in values):
+        values.append(field)
+    return [(k, v) for k, v in headers if k.lower() != b"vary"] + [(b"vary", b", ".join(values))]
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses for selected path prefixes
+
+    Skips: small bodies, non-compressible or already-encoded responses,
+    partial content and event streams (SSE must not be buffered). Every
+    response that could have been compressed carries Vary: Accept-Encoding
+    (merged with existing Vary values), whether it was compressed or not.
+    """
+
+    def __init__(
+        self,
+        app,
+        paths: Sequence[str] = COMPRESSED_PATHS,
+        min_bytes: int = COMPRESSION_MIN_BYTES,
+        cache: Optional[CompressedCache] = None
+    ):
+        self.app = app
+        self.paths = tuple(paths)
+        self.min_bytes = min_bytes
+        self.cache = cache or compressed_cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        if scope["path"].startswith("/query/stream"):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = negotiate_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+
+        start_message = None
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                if not self._is_compressible(message):
+                    passthrough = True
+                    await send(message)
+                    return
+                # The representation depends on Accept-Encoding, so shared caches
+                # must key on it even for responses sent uncompressed
+                start_message = {**message, "headers": _add_vary(list(message.get("headers", [])), b"Accept-Encoding")}
+                if encoding is None or self._declared_length(message) < self.min_bytes:
+                    passthrough = True
+                    await send(start_message)
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            if len(body) < self.min_bytes:
+                await send(start_message)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            compressed = self.cache.compress(body, encoding)
+            response_headers = [
+                (k, v) for k, v in start_message["headers"]
+                if k.lower() not in (b"content-length", b"etag")
+            ]
+            response_headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(compressed)).encode("latin-1")),
+            ]
+            # Strong validators must differ per encoding
+            etag = dict(start_message["headers"]).get(b"etag")
+            if etag:
+                suffix = b"-" + encoding.encode("latin-1")
+                etag = etag[:-1] + suffix + b'"' if etag.endswith(b'"') else etag + suffix
+                response_headers.append((b"etag", etag))
+
+            await send({**start_message, "headers": response_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _is_compressible(self, message) -> bool:
+        if message.get("status", 200) != 200:
+            return False
+        headers = {k.lower(): v for k, v in message.get("headers", [])}
+        if b"content-encoding" in headers:
+            return False
+        content_type = headers.get(b"content-type", b"").decode("latin-1").lower()
+        if content_type.startswith("text/event-stream"):
+            return False
+        return content_type.startswith(_COMPRESSIBLE_TYPES)
+
+    @staticmethod
+    def _declared_length(message) -> float:
+        """Content-Length of a response start (infinite when not declared)"""
+        for k, v in message.get("headers", []):
+            if k.lower() == b"content-length":
+                return int(v)
+        return float("inf")
+
+
+def get_compression_stats() -> Dict:
+    """Codecs and cache statistics"""
+    return {
+        "enabled": COMPRESSION_ENABLED,
+        "encodings": available_encodings(),
+        "min_bytes": COMPRESSION_MIN_BYTES,
+        "cache": compressed_cache.get_stats(),
+    }
+
+
+# --- Benchmark ---
+def _bench_compression(jsonl_path: str = "data/combined_tables.jsonl", repeat: int = 20):
+    """Size and CPU per encoding for typical /query payloads; transfer time at common link speeds"""
+    import json
+    import time
+
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    def payload(hits: List[Dict]) -> bytes:
+        return json.dumps({"slots": {}, "hits": hits, "query": "", "source": "slot-engine"}).encode("utf-8")
+
+    by_target: Dict[str, List[Dict]] = {}
+    for r in records:
+        by_target.setdefault(str(r.get("target_key", "")).lower(), []).append(r)
+    largest = max(by_target, key=lambda t: len(payload(by_target[t])))
+
+    payloads = {
+        "single table": payload(records[:1]),
+        f"largest target ({largest}, {len(by_target[largest])} hits)": payload(by_target[largest]),
+        f"all tables ({len(records)} hits)": payload(records),
+    }
+    links = {"1 Mbps": 1e6 / 8, "10 Mbps": 10e6 / 8, "100 Mbps": 100e6 / 8}
+
+    print("=" * 72)
+    print(f"Compression: encodings={available_encodings()}, x{repeat}")
+    print("=" * 72)
+    for name, body in payloads.items():
+        print(f"\n{name}: {len(body)} bytes")
+        print("  " + f"{'encoding':>9} {'bytes':>9} {'ratio':>6} {'cpu ms':>8}  " +
+              "  ".join(f"{link:>9}" for link in links))
+        rows = [("identity", body, 0.0)]
+        for encoding in available_encodings():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                out = _COMPRESSORS[encoding](body)
+            rows.append((encoding, out, (time.perf_counter() - start) / repeat * 1000))
+        for encoding, out, cpu_ms in rows:
+            transfer = "  ".join(f"{(len(out) / rate * 1000 + cpu_ms):7.1f}ms" for rate in links.values())
+            print(f"  {encoding:>9} {len(out):9d} {len(body) / len(out):6.1f} {cpu_ms:8.2f}  {transfer}")
+
+        cache = CompressedCache()
+        cache.compress(body, "gzip")
+        start = time.perf_counter()
+        for _ in range(repeat):
+            cache.compress(body, "gzip")
+        print(f"  cached gzip variant: {(time.perf_counter() - start) / repeat * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    _bench_compression()
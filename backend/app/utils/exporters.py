@@ -0,0 +1,122 @@
+"""
+Streaming conversation exporters (JSONL, Markdown, CSV) and zip archives
+Each exporter consumes a message iterator and yields text chunks, so memory
+use does not depend on the conversation length
+"""
+import csv
+import io
+import json
+import zipfile
+from typing import Callable, Dict, Iterable, Iterator, Tuple
+
+# Messages are written out in groups of this many per yielded chunk
+EXPORT_BATCH_MESSAGES = 200
+
+
+def _batched(lines: Iterable[str], size: int = EXPORT_BATCH_MESSAGES) -> Iterator[str]:
+    """Join lines into chunks of up to size lines"""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def iter_jsonl(session_id: str, messages: Iterable[Dict]) -> Iterator[str]:
+    """One JSON object per message"""
+    return _batched(
+        json.dumps({
+            "session_id": session_id,
+            "id": m["id"],
+            "role": m["role"],
+            "content": m["content"],
+            "created_at": m["created_at"],
+        }, ensure_ascii=False) + "\n"
+        for m in messages
+    )
+
+
+def iter_markdown(session_id: str, messages: Iterable[Dict]) -> Iterator[str]:
+    """Readable transcript with one section per message"""
+    yield f"# UNCCD GeoGLI Chatbot Conversation\n\nSession ID: `{session_id}`\n\n"
+    yield from _batched(
+        f"## {m['role'].upper()} ({m['created_at']})\n\n{m['content']}\n\n"
+        for m in messages
+    )
+
+
+def iter_csv(session_id: str, messages: Iterable[Dict]) -> Iterator[str]:
+    """CSV with a header row (RFC 4180 quoting)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["session_id", "id", "role", "content", "created_at"])
+
+    count = 0
+    for m in messages:
+        writer.writerow([session_id, m["id"], m["role"], m["content"], m["created_at"]])
+        count += 1
+        if count % EXPORT_BATCH_MESSAGES == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# format -> (exporter, media type, file extension)
+EXPORT_FORMATS: Dict[str, Tuple[Callable[[str, Iterable[Dict]], Iterator[str]], str, str]] = {
+    "jsonl": (iter_jsonl, "application/x-ndjson", "jsonl"),
+    "md": (iter_markdown, "text/markdown", "md"),
+    "csv": (iter_csv, "text/csv", "csv"),
+}
+
+
+class _ChunkSink:
+    """Write-only file object collecting zip output for a generator to drain"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip_archive(entries: Iterable[Tuple[str, Iterable[str]]]) -> Iterator[bytes]:
+    """
+    Stream a zip archive without seeking or buffering whole members
+
+    Args:
+        entries: (file name, text chunks) pairs, consumed lazily one at a time
+
+    Yields:
+        Archive bytes
+    """
+    sink = _ChunkSink()
+    # An unseekable sink makes zipfile write sizes in data descriptors after each member
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in entries:
+            with archive.open(name, mode="w", force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk.encode("utf-8"))
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
@@ -0,0 +1,53 @@
+"""
+Process memory accounting (shared vs private pages)
+"""
+import os
+import sys
+from typing import Dict, Optional, Union
+
+# smaps_rollup fields reported (kB in the file, MB in reports)
+_SMAPS_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_clean_mb",
+    "Shared_Dirty": "shared_dirty_mb",
+    "Private_Clean": "private_clean_mb",
+    "Private_Dirty": "private_dirty_mb",
+}
+
+
+def process_memory(pid: Union[int, str] = "self") -> Optional[Dict]:
+    """
+    Memory of a process split into shared and private pages
+
+    Pss divides each shared page among the processes that map it, so the sum
+    of Pss over all workers is their real combined footprint; after a preload
+    fork, a worker's Private_Dirty is what it does not share with the others.
+
+    Args:
+        pid: Process id ("self" for the current process)
+
+    Returns:
+        Dict with *_mb fields (Linux, from /proc/<pid>/smaps_rollup), only
+        max_rss_mb elsewhere; None if the process is gone
+    """
+    path = f"/proc/{pid}/smaps_rollup"
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                lines = f.readlines()
+        except OSError:
+            return None
+        stats = {}
+        for line in lines:
+            field, _, rest = line.partition(":")
+            if field in _SMAPS_FIELDS:
+                stats[_SMAPS_FIELDS[field]] = round(int(rest.split()[0]) / 1024, 1)
+        return stats
+
+    if pid != "self" and pid != os.getpid():
+        return None
+    import resource
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kB, macOS bytes
+    return {"max_rss_mb": round(max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)}
@@ -0,0 +1,144 @@
+"""
+Conversation PDF rendering (reportlab)
+Kept free of app state so it can run in export worker processes.
+reportlab (~90 ms to import) is loaded on the first render, not at app startup.
+"""
+import io
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Union
+
+
+# Flowables kept buffered ahead of the layout engine (keepWithNext/splitting look ahead)
+STORY_WINDOW = 64
+
+
+class _LazyStory(list):
+    """
+    Story list that is refilled from a flowable iterator as reportlab consumes it
+
+    doc.build() pops flowables from the front and checks len() every step, so only
+    a small window of Paragraphs exists at any time instead of the whole conversation.
+    """
+
+    def __init__(self, flowables: Iterator, window: int = STORY_WINDOW):
+        super().__init__()
+        self._source = flowables
+        self._window = window
+        self._refill()
+
+    def _refill(self):
+        while super().__len__() < self._window:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                break
+
+    def __len__(self) -> int:
+        self._refill()
+        return super().__len__()
+
+
+def render_conversation_pdf(session_id: str, messages: Iterable[Dict], output: Union[str, BinaryIO]):
+    """
+    Render a conversation as PDF
+
+    Args:
+        session_id: Session identifier
+        messages: Messages with role, content and created_at (may be a lazy iterator)
+        output: File path or writable binary file object
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate
+
+    # Create PDF document
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=letter,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=18
+    )
+    doc.build(_LazyStory(_conversation_flowables(session_id, messages)))
+
+
+def _conversation_flowables(session_id: str, messages: Iterable[Dict]) -> Iterator:
+    """Yield the PDF flowables for a conversation, one message at a time"""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import Paragraph, Spacer
+
+    # Get styles
+    styles = getSampleStyleSheet()
+    title_style = styles['Title']
+    heading_style = styles['Heading2']
+    normal_style = styles['Normal']
+
+    # Custom styles
+    user_style = ParagraphStyle(
+        'UserStyle',
+        parent=normal_style,
+        textColor=colors.blue,
+        leftIndent=20,
+        fontName='Helvetica-Bold'
+    )
+
+    assistant_style = ParagraphStyle(
+        'AssistantStyle',
+        parent=normal_style,
+        textColor=colors.darkgreen,
+        leftIndent=20
+    )
+
+    # Title
+    yield Paragraph("UNCCD GeoGLI Chatbot Conversation", title_style)
+    yield Spacer(1, 12)
+
+    # Session info
+    yield Paragraph(f"Session ID: {session_id}", heading_style)
+    yield Paragraph(f"Exported: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", normal_style)
+    yield Spacer(1, 12)
+
+    # Messages
+    for message in messages:
+        role = message['role']
+        content = message['content']
+        timestamp = message['created_at']
+
+        # Role header
+        role_text = f"{role.upper()} ({timestamp})"
+        yield Paragraph(role_text, heading_style)
+
+        # Message content
+        # Wrap long lines and escape HTML
+        content = content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+        if role == 'user':
+            yield Paragraph(content, user_style)
+        else:
+            yield Paragraph(content, assistant_style)
+
+        yield Spacer(1, 12)
+
+
+def render_conversation_pdf_buffer(session_id: str, messages: Iterable[Dict]) -> io.BytesIO:
+    """Render a conversation PDF into an in-memory buffer (rewound to the start)"""
+    buffer = io.BytesIO()
+    render_conversation_pdf(session_id, messages, buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def render_conversation_pdf_bytes(session_id: str, messages: List[Dict]) -> bytes:
+    """Render a conversation PDF in memory (process pool entry point)"""
+    return render_conversation_pdf_buffer(session_id, messages).getvalue()
+
+
+def iter_buffer_chunks(buffer: io.BytesIO, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Yield a buffer's content in chunks (for StreamingResponse)"""
+    while True:
+        chunk = buffer.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+    buffer.close()
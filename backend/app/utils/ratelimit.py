@@ -0,0 +1,475 @@
+"""
+Per-client rate limiting with token buckets
+Keyed by Dify user, session or client IP; quotas per endpoint prefix
+
+Each rule gives a client a bucket of `requests` tokens refilled over `period`
+seconds (bursts up to the full quota, sustained rate requests/period). User and
+session ids are unauthenticated, so clients that send one also draw from a
+bucket for their IP address holding RATE_LIMIT_IP_MULTIPLIER times the quota:
+rotating ids cannot exceed that per address. Every
+response on a limited path carries RateLimit-Limit, RateLimit-Remaining,
+RateLimit-Reset and RateLimit-Policy headers; an empty bucket gives 429 with
+Retry-After.
+
+Buckets live in a backend selected by RATE_LIMIT_BACKEND (only memory://
+for now: per worker process, so N workers allow up to N x the quota).
+A shared backend implements RateLimitBackend.take().
+
+Usage (benchmark, from backend/):
+    python -m app.utils.ratelimit
+"""
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory://")
+# Comma-separated "<path prefix>=<requests>/<seconds>"; the longest matching prefix applies
+RATE_LIMITS = os.getenv(
+    "RATE_LIMITS",
+    "/api/dify/chat=60/60,/api/dify/recognize=120/60,/query=60/60"
+)
+# Use the last X-Forwarded-For address (appended by the proxy) as client IP;
+# only behind a trusted proxy, earlier addresses are whatever the client sent
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+# Quota of the per-address bucket shared by all users/sessions of one IP, in multiples of the rule quota
+RATE_LIMIT_IP_MULTIPLIER = int(os.getenv("RATE_LIMIT_IP_MULTIPLIER", "4"))
+# Buckets kept by the memory backend (least recently used are dropped first)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+
+# JSON bodies up to this size are read to find the Dify "user" field
+_MAX_KEY_BODY_BYTES = 64 * 1024
+
+
+@dataclass
+class RateLimitRule:
+    """Quota for paths starting with prefix"""
+    prefix: str
+    requests: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        """Tokens refilled per second"""
+        return self.requests / self.period
+
+    @property
+    def policy(self) -> str:
+        return f"{self.requests};w={self.period:g}"
+
+
+@dataclass
+class BucketState:
+    """Outcome of taking a token"""
+    allowed: bool
+    remaining: int
+    # Seconds until the next token / until the bucket is full again
+    retry_after: float
+    reset: float
+
+
+def parse_rules(spec: str) -> List[RateLimitRule]:
+    """
+    Parse a RATE_LIMITS specification
+
+    Args:
+        spec: "/api/dify/chat=60/60,/query=120/60"
+
+    Returns:
+        Rules sorted by prefix length, longest first
+
+    Raises:
+        ValueError: For malformed entries
+    """
+    rules = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            prefix, quota = entry.rsplit("=", 1)
+            requests, period = quota.split("/", 1)
+            rule = RateLimitRule(prefix.strip(), int(requests), float(period))
+        except ValueError:
+            raise ValueError(f"Invalid RATE_LIMITS entry {entry!r} (expected <prefix>=<requests>/<seconds>)")
+        if not rule.prefix.startswith("/") or rule.requests < 1 or rule.period <= 0:
+            raise ValueError(f"Invalid RATE_LIMITS entry {entry!r}")
+        rules.append(rule)
+    return sorted(rules, key=lambda r: len(r.prefix), reverse=True)
+
+
+class RateLimitBackend:
+    """Token bucket storage; implementations must apply take() atomically per key"""
+
+    async def take(self, key: str, rule: RateLimitRule, cost: float = 1.0) -> BucketState:
+        """
+        Refill a bucket for the time elapsed and take cost tokens if available
+
+        Args:
+            key: Bucket key (rule prefix + client key)
+            rule: Quota of the bucket
+            cost: Tokens needed
+
+        Returns:
+            BucketState after the attempt
+        """
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict:
+        return {"backend": type(self).__name__}
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Buckets in process memory (event loop only; no awaits inside take)"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> (tokens, monotonic time of last update), least recently used first
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.evicted = 0
+
+    async def take(self, key: str, rule: RateLimitRule, cost: float = 1.0) -> BucketState:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (float(rule.requests), now))
+        tokens = min(float(rule.requests), tokens + (now - updated) * rule.rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        # Dropping a bucket only resets it to full; the oldest ones mostly are already
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            self.evicted += 1
+
+        return BucketState(
+            allowed=allowed,
+            remaining=int(tokens),
+            retry_after=0.0 if allowed else (cost - tokens) / rule.rate,
+            reset=(rule.requests - tokens) / rule.rate,
+        )
+
+    def get_stats(self) -> Dict:
+        return {**super().get_stats(), "keys": len(self._buckets), "max_keys": self.max_keys, "evicted": self.evicted}
+
+
+def create_backend(url: str) -> RateLimitBackend:
+    """
+    Create a rate limit backend from a URL
+
+    Args:
+        url: memory://
+
+    Returns:
+        RateLimitBackend instance
+
+    Raises:
+        ValueError: For unsupported URL schemes
+    """
+    scheme, sep, _ = url.partition("://")
+    if sep and scheme.lower() == "memory":
+        return MemoryRateLimitBackend()
+    raise ValueError(f"Unsupported RATE_LIMIT_BACKEND: {url!r} (supported: memory://)")
+
+
+class RateLimiter:
+    """Rules, backend and counters"""
+
+    def __init__(
+        self,
+        rules: Sequence[RateLimitRule],
+        backend: RateLimitBackend,
+        ip_multiplier: int = RATE_LIMIT_IP_MULTIPLIER
+    ):
+        self.rules = list(rules)
+        self.backend = backend
+        self.ip_multiplier = max(1, ip_multiplier)
+        # prefix -> quota of the per-address bucket
+        self.ip_rules = {r.prefix: replace(r, requests=r.requests * self.ip_multiplier) for r in self.rules}
+        # prefix -> {"allowed": n, "limited": n, "limited_by_ip": n}
+        self.counts: Dict[str, Dict[str, int]] = {
+            r.prefix: {"allowed": 0, "limited": 0, "limited_by_ip": 0} for r in self.rules
+        }
+        self.by_key_type: Dict[str, int] = {"user": 0, "session": 0, "ip": 0}
+
+    def rule_for(self, path: str) -> Optional[RateLimitRule]:
+        for rule in self.rules:
+            if path.startswith(rule.prefix):
+                return rule
+        return None
+
+    async def check(
+        self,
+        rule: RateLimitRule,
+        client_key: str,
+        ip: Optional[str] = None
+    ) -> Tuple[RateLimitRule, BucketState]:
+        """
+        Take a token for a request
+
+        Args:
+            rule: Rule of the request path
+            client_key: Key from client_key()
+            ip: Client address; user/session clients also take from its
+                per-address bucket (ip_multiplier x the quota)
+
+        Returns:
+            (quota, state) of the deciding bucket: the one that refused, else
+            the one with the fewest tokens left
+        """
+        key_type = client_key.split(":", 1)[0]
+        buckets = [(rule, f"{rule.prefix}|{client_key}")]
+        if ip is not None and key_type != "ip":
+            # Address bucket first: a client rotating ids is refused before it
+            # creates (and evicts other clients' buckets with) new id buckets
+            buckets.insert(0, (self.ip_rules[rule.prefix], f"{rule.prefix}|ip-all:{ip}"))
+
+        decision = None
+        for quota, key in buckets:
+            state = await self.backend.take(key, quota)
+            if decision is None or not state.allowed or state.remaining < decision[1].remaining:
+                decision = (quota, state)
+            if not state.allowed:
+                if quota is not rule:
+                    self.counts[rule.prefix]["limited_by_ip"] += 1
+                break
+
+        self.counts[rule.prefix]["allowed" if decision[1].allowed else "limited"] += 1
+        self.by_key_type[key_type] += 1
+        return decision
+
+    def get_stats(self) -> Dict:
+        return {
+            "rules": {r.prefix: {"requests": r.requests, "period": r.period, **self.counts[r.prefix]}
+                      for r in self.rules},
+            "ip_multiplier": self.ip_multiplier,
+            "keys_by_type": dict(self.by_key_type),
+            "backend": self.backend.get_stats(),
+        }
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the process-wide limiter (created from the environment on first use)"""
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter(parse_rules(RATE_LIMITS), create_backend(RATE_LIMIT_BACKEND))
+    return _limiter
+
+
+def client_ip(scope) -> str:
+    """
+    Client address of a request
+
+    With RATE_LIMIT_TRUST_PROXY the last X-Forwarded-For address is used: the
+    proxy appends the peer it saw, anything before it is client-supplied.
+    """
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = dict(scope.get("headers") or []).get(b"x-forwarded-for", b"").decode("latin-1")
+        hop = forwarded.rsplit(",", 1)[-1].strip()
+        if hop:
+            return hop
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def client_key(scope, body: Optional[bytes] = None) -> str:
+    """
+    Identify the client of a request, most specific first
+
+    1. "user" of a Dify JSON body (DifyChatRequest.user)
+    2. session: session_id query parameter, X-Session-Id header or
+       Dify conversation_id
+    3. client IP (see client_ip)
+
+    Returns:
+        "user:<id>", "session:<id>" or "ip:<address>"
+    """
+    payload = {}
+    if body:
+        try:
+            payload = json.loads(body)
+        except (ValueError, UnicodeDecodeError):
+            payload = {}
+        if not isinstance(payload, dict):
+            payload = {}
+    user = payload.get("user")
+    if isinstance(user, str) and user.strip():
+        return f"user:{user.strip()}"
+
+    headers = dict(scope.get("headers") or [])
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    session = (
+        (query.get("session_id") or [""])[0]
+        or headers.get(b"x-session-id", b"").decode("latin-1")
+        or payload.get("conversation_id")
+    )
+    if isinstance(session, str) and session.strip():
+        return f"session:{session.strip()}"
+
+    return f"ip:{client_ip(scope)}"
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware applying per-client and per-address token buckets to the rule prefixes
+
+    Small JSON POST bodies are read ahead to find the Dify user and replayed
+    to the app unchanged.
+    """
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.limiter = limiter or get_rate_limiter()
+
+    async def __call__(self, scope, receive, send):
+        rule = self.limiter.rule_for(scope["path"]) if scope["type"] == "http" else None
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        body = None
+        headers = dict(scope.get("headers") or [])
+        if scope["method"] == "POST" and headers.get(b"content-type", b"").startswith(b"application/json"):
+            body, receive = await _read_ahead(receive, _MAX_KEY_BODY_BYTES)
+
+        quota, state = await self.limiter.check(rule, client_key(scope, body), client_ip(scope))
+        rate_headers = [
+            (b"ratelimit-limit", str(quota.requests).encode("latin-1")),
+            (b"ratelimit-remaining", str(state.remaining).encode("latin-1")),
+            (b"ratelimit-reset", str(math.ceil(state.reset)).encode("latin-1")),
+            (b"ratelimit-policy", quota.policy.encode("latin-1")),
+        ]
+
+        if not state.allowed:
+            retry_after = max(1, math.ceil(state.retry_after))
+            content = json.dumps({"msg": "Rate limit exceeded", "retry_after": retry_after}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(content)).encode("latin-1")),
+                    (b"retry-after", str(retry_after).encode("latin-1")),
+                ] + rate_headers,
+            })
+            await send({"type": "http.response.body", "body": content})
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + rate_headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+async def _read_ahead(receive, max_bytes: int):
+    """
+    Read the request body up to max_bytes
+
+    Returns:
+        (body or None if larger / disconnected, receive callable replaying what was read)
+    """
+    messages = []
+    size = 0
+    complete = False
+    while size <= max_bytes:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        size += len(message.get("body", b""))
+        if not message.get("more_body", False):
+            complete = True
+            break
+
+    async def replay():
+        if messages:
+            return messages.pop(0)
+        return await receive()
+
+    body = b"".join(m.get("body", b"") for m in messages) if complete else None
+    return body, replay
+
+
+def get_rate_limit_stats() -> Dict:
+    """Rules, allowed/limited counts and backend state"""
+    stats = {"enabled": RATE_LIMIT_ENABLED, "trust_proxy": RATE_LIMIT_TRUST_PROXY}
+    if _limiter is not None:
+        stats.update(_limiter.get_stats())
+    return stats
+
+
+# --- Benchmark ---
+def _bench_ratelimit(seconds: float = 3.0, clients: int = 5):
+    """
+    One greedy client (as fast as possible) and one sending a new user id with
+    every request (same address) next to clients at 1 request/s, 60/60s quota:
+    greedy is cut to its quota, the rotating client to the per-address quota,
+    others unaffected
+    """
+    import asyncio
+
+    async def backend(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def request(app, user: str, ip: str) -> int:
+        body = json.dumps({"query": "china commitments", "user": user}).encode()
+        status = {}
+
+        async def receive():
+            return {"type": "http.request", "body": body}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+
+        scope = {"type": "http", "method": "POST", "path": "/api/dify/chat", "query_string": b"",
+                 "headers": [(b"content-type", b"application/json")], "client": (ip, 1)}
+        await app(scope, receive, send)
+        return status["code"]
+
+    async def run():
+        limiter = RateLimiter(parse_rules("/api/dify/chat=60/60"), MemoryRateLimitBackend())
+        app = RateLimitMiddleware(backend, limiter)
+        counts: Dict[str, Dict[int, int]] = {}
+
+        async def client(name: str, ip: str, interval: float, rotate: bool = False):
+            end = time.monotonic() + seconds
+            sent = 0
+            while time.monotonic() < end:
+                code = await request(app, f"{name}-{sent}" if rotate else name, ip)
+                sent += 1
+                counts.setdefault(name, {}).setdefault(code, 0)
+                counts[name][code] += 1
+                await asyncio.sleep(interval)
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            client("greedy", "10.0.0.1", 0),
+            client("rotating", "10.0.0.2", 0, rotate=True),
+            *(client(f"polite-{i}", f"10.0.1.{i}", 1.0) for i in range(clients))
+        )
+        elapsed = time.perf_counter() - start
+        total = sum(sum(c.values()) for c in counts.values())
+        return counts, total / elapsed
+
+    counts, per_second = asyncio.run(run())
+    print("=" * 72)
+    print(f"Rate limit: {seconds:.0f}s, quota 60/60s per user, "
+          f"{60 * RATE_LIMIT_IP_MULTIPLIER}/60s per address, {per_second:,.0f} checks/s")
+    print("=" * 72)
+    for user, codes in sorted(counts.items()):
+        print(f"  {user:<10} 200: {codes.get(200, 0):>7}   429: {codes.get(429, 0):>7}")
+
+
+if __name__ == "__main__":
+    _bench_ratelimit()
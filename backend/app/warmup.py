@@ -0,0 +1,180 @@
+"""
+Startup warmup: load data indexes, prime caches and run sample queries
+before the worker reports ready (see the lifespan hook in app.main)
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+
+# Queries run through router + dispatcher at startup (";"-separated)
+WARMUP_QUERIES = [
+    q.strip() for q in os.getenv(
+        "WARMUP_QUERIES",
+        "China commitments;Kenya legislation;Brazil country profile"
+    ).split(";") if q.strip()
+]
+
+
+class WarmupState:
+    """Progress of the startup warmup (read by the health endpoint)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.status = "pending"  # pending -> warming -> ready | failed
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.steps: Dict[str, Dict] = {}
+        self.errors: List[str] = []
+
+    @property
+    def ready(self) -> bool:
+        # A failed step degrades to lazy loading; it does not keep the worker out of rotation
+        return self.status in ("ready", "failed")
+
+    def start(self):
+        with self._lock:
+            self.status = "warming"
+            self.started_at = time.time()
+
+    def record(self, name: str, duration_ms: float, result: Optional[Dict] = None, error: Optional[str] = None):
+        with self._lock:
+            step = {"ms": round(duration_ms, 1)}
+            if result:
+                step.update(result)
+            if error:
+                step["error"] = error
+                self.errors.append(f"{name}: {error}")
+            self.steps[name] = step
+
+    def finish(self):
+        with self._lock:
+            self.finished_at = time.time()
+            self.status = "failed" if self.errors else "ready"
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            duration = None
+            if self.started_at is not None:
+                duration = round(((self.finished_at or time.time()) - self.started_at) * 1000, 1)
+            return {
+                "status": self.status,
+                "ready": self.ready,
+                "duration_ms": duration,
+                "steps": dict(self.steps),
+                "errors": list(self.errors),
+            }
+
+
+# Global warmup state
+warmup_state = WarmupState()
+
+
+def _warm_database() -> Dict:
+    """Apply migrations, create the conversation store and read the session index once"""
+    from app.storage import get_store
+
+    store = get_store()
+    db = store.get_database()
+    if db is None:
+        return {"migrations_applied": 0, "store": type(store).__name__}
+    applied = db.init_database()
+    # Pulls the sessions index pages into the OS cache
+    db.get_session("__warmup__")
+    return {"migrations_applied": applied, "store": type(store).__name__}
+
+
+def _warm_sources() -> Dict:
+    """Build source indexes (tabular JSONL files)"""
+    from app.engine.dispatcher import SOURCES
+
+    return {source.__class__.__name__: source.warmup() for source in SOURCES}
+
+
+def _warm_queries() -> Dict:
+    """Route and dispatch WARMUP_QUERIES (primes router, target and source code paths)"""
+    from app.search.router_intent import route
+    from app.engine.dispatcher import run_slot_query
+
+    hits = 0
+    for query in WARMUP_QUERIES:
+        slots = route(query)
+        result = run_slot_query(
+            domain=slots.get("domain", "country_profile"),
+            targets=slots.get("targets", []),
+            section_hint=slots.get("section_hint"),
+            iso3_codes=slots.get("iso3_codes", [])
+        )
+        hits += len(result.get("hits", []))
+    return {"queries": len(WARMUP_QUERIES), "hits": hits}
+
+
+WARMUP_STEPS: List[tuple] = [
+    ("database", _warm_database),
+    ("sources", _warm_sources),
+    ("queries", _warm_queries),
+]
+
+
+def run_warmup(steps: Optional[List[tuple]] = None, state: WarmupState = warmup_state) -> Dict:
+    """
+    Run warmup steps in order (blocking; call from a worker thread)
+
+    A failing step is recorded and skipped, so whatever it would have
+    loaded is loaded on first use instead.
+
+    Args:
+        steps: (name, callable) pairs (default WARMUP_STEPS)
+        state: State to update
+
+    Returns:
+        Warmup stats
+    """
+    state.start()
+    for name, step in steps or WARMUP_STEPS:
+        start = time.perf_counter()
+        try:
+            result = step()
+            state.record(name, (time.perf_counter() - start) * 1000, result=result)
+        except Exception as e:
+            state.record(name, (time.perf_counter() - start) * 1000, error=str(e))
+            print(f"⚠️  Warmup step '{name}' failed: {e}")
+    state.finish()
+
+    stats = state.get_stats()
+    timings = ", ".join(f"{name}={step['ms']}ms" for name, step in stats["steps"].items())
+    print(f"🔥 Warmup {stats['status']} in {stats['duration_ms']} ms ({timings})")
+    return stats
+
+
+def preload_shared() -> Dict:
+    """
+    Fork-safe subset of the warmup for a pre-fork master (app.serve)
+
+    Loads read-only data (schema check, source snapshots) without starting
+    threads or event loops; workers forked afterwards share it copy-on-write.
+
+    Returns:
+        Per-step stats
+    """
+    stats = {}
+    for name, step in (("database", _warm_database_schema), ("sources", _warm_sources)):
+        start = time.perf_counter()
+        result = step()
+        stats[name] = {"ms": round((time.perf_counter() - start) * 1000, 1), **result}
+    return stats
+
+
+def _warm_database_schema() -> Dict:
+    from app.storage import get_database
+
+    db = get_database()
+    return {"migrations_applied": db.init_database() if db is not None else 0}
+
+
+def mark_ready_without_warmup(state: WarmupState = warmup_state):
+    """Report ready immediately (WARMUP_ENABLED=false)"""
+    state.start()
+    state.finish()
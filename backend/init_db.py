@@ -6,6 +6,6 @@ from app.database import db
 
 if __name__ == "__main__":
     print("Initializing database...")
-    # Database is automatically initialized when imported
-    print(f"Database initialized successfully at: {db.db_path}")
-
+    # Creates the file and applies pending schema migrations
+    applied = db.init_database()
+    print(f"Database initialized successfully at: {db.db_path} ({applied} migrations applied)")